@@ -1,5 +1,7 @@
 import os
+import copy
 import shutil
+import tempfile
 import argparse
 import json
 import yaml
@@ -10,14 +12,28 @@ import re
 import logging
 import math
 import sys
+import fcntl
+import functools
+import contextlib
+import threading
+import queue
 import concurrent.futures
-from xml.dom.pulldom import parse, START_ELEMENT
 from xml.sax.saxutils import escape as xml_escape
 from xml.etree import ElementTree as ET
+from collections import OrderedDict, deque
 from datetime import datetime, timezone
+from email.utils import formatdate
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from asnake.client import ASnakeClient
+try:
+    # Rust-based JSON library, much faster than the json module on large documents
+    from orjson import loads as json_loads, dumps as json_dumps
+except ImportError:
+    from json import loads as json_loads, dumps as json_dumps
 from multiprocessing.pool import ThreadPool as Pool
-from utils.stage_classifications import extract_labels
+from utils.stage_classifications import extract_rg_sg_labels
+from utils.yaml_loader import SafeLoader, SafeDumper
 from services.xml_transform_service import XmlTransformService
 from services.agent_service import AgentService
 from services.omeka.omeka_service import OmekaService
@@ -40,12 +56,101 @@ logging.basicConfig(
     ]
 )
 
+# parsed YAML files, keyed by file path and invalidated when the
+# modification time or size of the file changes
+yaml_cache = OrderedDict()
+yaml_cache_max_size = 16
+# load_yaml_file is called from worker threads
+yaml_cache_lock = threading.Lock()
+
+
+def load_yaml_file(file_path):
+    """
+    Load a YAML file, reusing the previously parsed content while the file
+    is unchanged. Returns a copy, so callers can safely modify it.
+
+    Raises FileNotFoundError if the file does not exist.
+    """
+    stat = os.stat(file_path)
+    cache_key = (stat.st_mtime_ns, stat.st_size)
+    with yaml_cache_lock:
+        cached = yaml_cache.get(file_path)
+        if cached is None or cached[0] != cache_key:
+            with open(file_path, 'r') as file:
+                cached = (cache_key, yaml.load(file, Loader=SafeLoader))
+            yaml_cache[file_path] = cached
+            if len(yaml_cache) > yaml_cache_max_size:
+                yaml_cache.popitem(last=False)
+        yaml_cache.move_to_end(file_path)
+    return copy.deepcopy(cached[1])
+
+
+@contextlib.contextmanager
+def atomic_write(file_path, mode='wb'):
+    """
+    Open a temporary file next to file_path, renamed over file_path once the
+    block completes, so readers never see a partially written file. If the
+    block raises, the temporary file is removed and file_path is unchanged.
+    """
+    file = tempfile.NamedTemporaryFile(
+        mode, dir=os.path.dirname(file_path), prefix='.', suffix='.tmp', delete=False)
+    try:
+        with file:
+            yield file
+        os.chmod(file.name, 0o644)
+        os.replace(file.name, file_path)
+    except BaseException:
+        try:
+            os.remove(file.name)
+        except FileNotFoundError:
+            pass
+        raise
+
+# URIs of the records in the ArchivesSpace delete feed
+deleted_object_pattern = re.compile(
+    r'^/repositories/(?P<repo_id>\d+)/(?P<object_type>resources|digital_objects)/(?P<record_id>\d+)$')
+deleted_agent_pattern = re.compile(
+    r'^/agents/(?P<agent_type>people|corporate_entities|families)/(?P<record_id>\d+)$')
+
+
+def aspace_timestamp(value):
+    """
+    Convert an ArchivesSpace ISO 8601 timestamp (e.g. system_mtime) to
+    seconds since the epoch.
+    """
+    # fromisoformat only supports the Zulu timezone suffix from Python 3.11
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+@functools.lru_cache(maxsize=4096)
+def id_from_uri(uri):
+    """
+    Get the ID of an ArchivesSpace record from its URI
+    (e.g. '123' from /repositories/2/resources/123).
+    """
+    return uri.rsplit('/', 1)[-1]
+
 
 class ArcFlow:
     """
     ArcFlow is a class that represents a flow of data from ArchivesSpace
     to ArcLight.
     """
+    # repository fields written to ArcLight's repositories.yml
+    REPOSITORY_FIELDS = (
+        'name',
+        'description',
+        'contact_html',
+        'location_html',
+        'thumbnail_url',
+        # 'request_types',
+    )
+    # seconds between PDF job status checks, backing off up to the maximum
+    PDF_POLL_INITIAL_DELAY = 2
+    PDF_POLL_MAX_DELAY = 30
+    # seconds a PDF job is polled before it is left for the next run
+    PDF_JOB_TIMEOUT = 6 * 60 * 60
+    PDF_JOB_FINISHED_STATUSES = ('completed', 'canceled', 'failed')
 
 
     def __init__(
@@ -66,6 +171,7 @@ class ArcFlow:
             skip_resource_processing=False,
             skip_collection_indexing=False,
             dry_run_aspace=False,
+            max_processes=4,
         ):
         # check if error_log_file is not empty and log a critical error if it is
         # to avoid keep running ArcFlow with unresolved errors that could lead 
@@ -76,8 +182,24 @@ class ArcFlow:
 
         self.solr_url = solr_url
         self.aspace_solr_url = aspace_solr_url
+        # keep-alive session shared by all Solr requests, retrying
+        # transient gateway errors (Solr selects, deletes and commits
+        # are idempotent, so POSTs are retried too)
+        self.solr_session = requests.Session()
+        solr_adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=64,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[502, 503, 504],
+                allowed_methods=['GET', 'POST'],
+                raise_on_status=False))
+        self.solr_session.mount('http://', solr_adapter)
+        self.solr_session.mount('https://', solr_adapter)
         self.batch_size = 400
-        self.max_processes = 4 # more than 10 seems to exhaust the connection pool and cause errors. 4 is an empirically derived number that seems to work well based on the amount of memory and CPU power of the server, but this can be adjusted as needed.
+        self.resources_batch_size = 100 # resources fetched per ArchivesSpace request
+        self.max_processes = max_processes # 4 (the default) is an empirically derived number that seems to work well based on the amount of memory and CPU power of the server, but this can be adjusted as needed with --max-processes.
         self.arclight_dir = arclight_dir
         if ead_extra_config.strip():
             if not os.path.isfile(ead_extra_config):
@@ -104,37 +226,56 @@ class ArcFlow:
         self.skip_resource_processing = skip_resource_processing
         self.skip_collection_indexing = skip_collection_indexing
         self.dry_run_aspace = dry_run_aspace
+        # records queued by delete_ead and delete_creator,
+        # deleted from Solr by flush_solr_deletes
+        self.pending_solr_deletes = []
+        self.solr_deletes_lock = threading.Lock()
+        # set when Solr has changes not yet committed by commit_arclight_solr
+        self.solr_commit_pending = False
+        # set by run_all while workflows run in parallel; Solr commits are
+        # global, so a workflow's commit would also expose the other
+        # workflow's uncommitted teardown
+        self.solr_commits_held = False
+        # gem paths looked up by get_gem_path
+        self.gem_paths = {}
+        self.gem_paths_lock = threading.Lock()
+        # repositories fetched by get_repositories
+        self.repositories = None
+        self.repositories_lock = threading.Lock()
+        # directory entries scanned by get_dir_entries
+        self.dir_entries = {}
+        self.dir_entries_lock = threading.Lock()
+        # PDF job symlinks created by task_resource, polled by poll_pdf_jobs
+        # while process_collections runs
+        self.pdf_job_queue = None
         self.log = logging.getLogger('arcflow')
         self.pid = os.getpid()
         self.pid_file_path = os.path.join(base_dir, 'arcflow.pid')
-        self.arcflow_file_path = os.path.join(base_dir, '.arcflow.yml')
+        self.arcflow_file_path = os.path.join(base_dir, '.arcflow.json')
+        # legacy timestamps file, read when .arcflow.json doesn't exist yet
+        self.arcflow_yaml_file_path = os.path.join(base_dir, '.arcflow.yml')
         self.omeka_file_path = os.path.join(base_dir, '.omeka.yml')
-        if self.is_running():
+        if not self.lock_pid_file():
             self.log.info(f'ArcFlow process previously started still running. Exiting (PID: {self.pid}).')
             exit(0)
-        else:
-            self.create_pid_file()
 
         self.start_time = int(time.time())
         try:
-            with open(self.arcflow_file_path, 'r') as file:
-                config = yaml.safe_load(file) or {}
+            config = self.load_config_file()
             try:
-                date_fmt = '%Y-%m-%dT%H:%M:%S%z'
-                epoch = datetime.fromtimestamp(0, timezone.utc)
                 legacy_ts = config.get('last_updated')
-                collections_ts_str = config.get('last_updated_collections') or legacy_ts
-                creators_ts_str = config.get('last_updated_creators') or legacy_ts
-                digital_objects_ts_str = config.get('last_updated_digital_objects') or legacy_ts
-                self.last_updated_collections = datetime.strptime(collections_ts_str, date_fmt) if collections_ts_str else epoch
-                self.last_updated_creators = datetime.strptime(creators_ts_str, date_fmt) if creators_ts_str else epoch
-                self.last_updated_digital_objects = datetime.strptime(digital_objects_ts_str, date_fmt) if digital_objects_ts_str else epoch
+                self.last_updated_collections = self.parse_config_timestamp(
+                    config.get('last_updated_collections') or legacy_ts)
+                self.last_updated_creators = self.parse_config_timestamp(
+                    config.get('last_updated_creators') or legacy_ts)
+                self.last_updated_digital_objects = self.parse_config_timestamp(
+                    config.get('last_updated_digital_objects') or legacy_ts)
             except Exception as e:
-                self.log.error(f'Error parsing last_updated date on file .arcflow.yml: {e}')
+                self.log.error(f'Error parsing last_updated date on file .arcflow.json or .arcflow.yml: {e}')
                 exit(1)
         except FileNotFoundError:
             if not self.force_update:
-                self.log.error('File .arcflow.yml not found. Create the file and try again or run with --force-update to recreate EADs from scratch.')
+                self.log.error('File .arcflow.json (or legacy .arcflow.yml) not found. Create the file and try again or run with --force-update to recreate EADs from scratch.')
                 exit(1)
             else:
                 self.last_updated_collections = datetime.fromtimestamp(0, timezone.utc)
@@ -149,8 +290,7 @@ class ArcFlow:
             self.last_updated_digital_objects)
 
         try:
-            with open(os.path.join(base_dir, '.archivessnake.yml'), 'r') as file:
-                config = yaml.safe_load(file)
+            config = load_yaml_file(os.path.join(base_dir, '.archivessnake.yml'))
         except FileNotFoundError:
             self.log.error('File .archivessnake.yml not found. Create the file.')
             exit(1)
@@ -160,6 +300,20 @@ class ArcFlow:
                 password=config['password'],
                 baseurl=config['baseurl'],
             )
+            # keep-alive connections for every worker thread (requests pools
+            # only 10 per host by default), retrying transient gateway errors
+            # on idempotent requests only
+            aspace_adapter = HTTPAdapter(
+                pool_connections=16,
+                pool_maxsize=64,
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.2,
+                    status_forcelist=[502, 503, 504],
+                    allowed_methods=['GET'],
+                    raise_on_status=False))
+            self.client.session.mount('http://', aspace_adapter)
+            self.client.session.mount('https://', aspace_adapter)
             self.client.authorize()
         except Exception as e:
             self.log.error(f'Error authorizing ASnakeClient: {e}')
@@ -167,9 +321,8 @@ class ArcFlow:
 
         # Initialize services
         try:
-            with open(self.omeka_file_path, 'r') as file:
-                config = yaml.safe_load(file)
-                self.use_archon = config.get('use_archon', 0)
+            config = load_yaml_file(self.omeka_file_path)
+            self.use_archon = config.get('use_archon', 0)
         except FileNotFoundError:
             self.log.error('File .omeka.yml not found. Create the file.')
             exit(1)
@@ -188,27 +341,36 @@ class ArcFlow:
         self.agent_service = AgentService(client=self.client, log=self.log)
 
 
-    def is_running(self):
+    def lock_pid_file(self):
         """
-        Check if the ArcFlow process is already running.
+        Lock the PID file to indicate that the ArcFlow process is running.
+        The lock is held until the process exits, so it can't outlive a
+        crashed run or be confused with a reused PID.
+
+        Returns False if another ArcFlow process holds the lock.
         """
-        if os.path.isfile(self.pid_file_path):
-            with open(self.pid_file_path, 'r') as file:
-                pid = int(file.read().strip())
-            try:
-                os.kill(pid, 0)
-                return True
-            except OSError:
-                pass
-        return False
+        self.pid_file = open(self.pid_file_path, 'a+')
+        try:
+            fcntl.flock(self.pid_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.pid_file.close()
+            return False
+        self.pid_file.seek(0)
+        self.pid_file.truncate()
+        self.pid_file.write(str(self.pid))
+        self.pid_file.flush()
+        return True
 
 
-    def create_pid_file(self):
+    def get_repositories(self):
         """
-        Create a PID file to indicate that the ArcFlow process is running.
+        Get the list of repositories from ArchivesSpace. It is fetched once
+        and shared by all the steps of the run.
         """
-        with open(self.pid_file_path, 'w') as file:
-            file.write(str(self.pid))
+        with self.repositories_lock:
+            if self.repositories is None:
+                self.repositories = json_loads(self.client.get('repositories').content)
+            return self.repositories
 
 
     def update_repositories(self):
@@ -216,90 +378,97 @@ class ArcFlow:
         Update the repositories.yml file with the latest data from ArchivesSpace.
         """
         repos_file_path = f'{self.arclight_dir}/config/repositories.yml'
-        repos = self.client.get('repositories').json()
+        repos = self.get_repositories()
+
+        last_updated = self.last_updated_global.timestamp()
+        def is_modified(repo):
+            return (self.force_update
+                or last_updated <= aspace_timestamp(repo['system_mtime'])
+                or last_updated <= aspace_timestamp(repo['user_mtime']))
 
         if self.force_update:
             update_repos = True
         else:
             self.log.info('Checking for updates on repositories information...')
 
-            update_repos = False
-            for repo in repos:
-                # python doesn't support Zulu timezone suffixes,
-                # converting system_mtime and user_mtime to UTC offset notation
-                if (self.last_updated_global <= datetime.strptime(
-                        repo['system_mtime'].replace('Z','+0000'),
-                        '%Y-%m-%dT%H:%M:%S%z')
-                        or self.last_updated_global <= datetime.strptime(
-                        repo['user_mtime'].replace('Z','+0000'),
-                        '%Y-%m-%dT%H:%M:%S%z')):
-                    update_repos = True
-                    break
+            update_repos = any(is_modified(repo) for repo in repos)
 
         if update_repos:
-            with open(repos_file_path, 'w') as file:
-                self.log.info(f'Updating file {repos_file_path}...')
-                for repo in repos:
-                    if repo['publish']:
-                        agent_representation = self.client.get(
-                            repo['agent_representation']['ref']).json()
-
-                        contact = agent_representation['agent_contacts'][0]
-
-                        telephones = [
-                            f'<div class="al-repository-contact-{x["number_type"]}">{x["number"]}</div>'
-                            for x in contact['telephones']
-                        ]
-                        repo['contact_html'] = telephones
-                        if 'email' in contact:
-                            repo['contact_html'].append(
-                                f'<div class="al-repository-contact-info"><a href="mailto:{contact["email"]}">{contact["email"]}</a></div>'
-                            )
-                        repo['contact_html'] = ''.join(repo['contact_html'])
-
-                        city_state_zip_country = []
-                        for x in ('city', 'region', 'country'):
-                            if x in contact:
-                                if x == 'region' and 'post_code' in contact:
-                                    city_state_zip_country.append(
-                                        f'{contact[x]} {contact["post_code"]}')
-                                else:
-                                    city_state_zip_country.append(f'{contact[x]}')
-
-                        repo['location_html'] = []
-                        if 'address_1' in contact:
-                            repo['location_html'].append(
-                                f'<div class="al-repository-street-address-building">{contact["address_1"]}</div>')
-                        if 'address_2' in contact:
-                            repo['location_html'].append(
-                                f'<div class="al-repository-street-address-address1">{contact["address_2"]}</div>')
-                        if city_state_zip_country:
-                            repo['location_html'].append(
-                                f'<div class="al-repository-street-address-city_state_zip_country">{", ".join(city_state_zip_country)}</div>')
-                        repo['location_html'] = ''.join(repo['location_html'])
-
-                        if 'image_url' in repo:
-                            repo['thumbnail_url'] = repo['image_url']
-
-                        yaml.safe_dump({
-                            self.get_repo_id(repo): {
-                                k:repo[k] if k in repo else ""
-                                for k in (
-                                    'name',
-                                    'description',
-                                    'contact_html',
-                                    'location_html',
-                                    'thumbnail_url',
-                                    # 'request_types',
-                                )
-                            },
-                        }, file, width=float('inf'))
+            self.log.info(f'Updating file {repos_file_path}...')
+            # reuse the entries of the unmodified repositories
+            current_repositories = {}
+            if not self.force_update:
+                try:
+                    current_repositories = load_yaml_file(repos_file_path) or {}
+                except FileNotFoundError:
+                    pass
+            published_repos = [repo for repo in repos if repo['publish']]
+            modified_repos = [
+                repo for repo in published_repos
+                if is_modified(repo) or self.get_repo_id(repo) not in current_repositories]
+
+            # fetch the agent representations (contact information) of the
+            # modified repositories concurrently
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_processes) as executor:
+                agent_representations = dict(zip(
+                    (repo['uri'] for repo in modified_repos),
+                    executor.map(
+                        lambda repo: json_loads(self.client.get(repo['agent_representation']['ref']).content),
+                        modified_repos)))
+
+            repositories = {}
+            for repo in published_repos:
+                repo_id = self.get_repo_id(repo)
+                if repo['uri'] not in agent_representations:
+                    repositories[repo_id] = current_repositories[repo_id]
+                    continue
+
+                contact = agent_representations[repo['uri']]['agent_contacts'][0]
+
+                contact_html = ''.join(
+                    f'<div class="al-repository-contact-{x["number_type"]}">{x["number"]}</div>'
+                    for x in contact['telephones'])
+                if 'email' in contact:
+                    contact_html += f'<div class="al-repository-contact-info"><a href="mailto:{contact["email"]}">{contact["email"]}</a></div>'
+
+                city_state_zip_country = ', '.join(
+                    f'{contact[x]} {contact["post_code"]}'
+                    if x == 'region' and 'post_code' in contact else f'{contact[x]}'
+                    for x in ('city', 'region', 'country') if x in contact)
+
+                location_html = ''.join((
+                    f'<div class="al-repository-street-address-building">{contact["address_1"]}</div>'
+                    if 'address_1' in contact else '',
+                    f'<div class="al-repository-street-address-address1">{contact["address_2"]}</div>'
+                    if 'address_2' in contact else '',
+                    f'<div class="al-repository-street-address-city_state_zip_country">{city_state_zip_country}</div>'
+                    if city_state_zip_country else '',
+                ))
+
+                # the repository records are shared with the other steps of
+                # the run, the generated fields are added to a copy
+                repo_fields = {
+                    **repo,
+                    'contact_html': contact_html,
+                    'location_html': location_html,
+                }
+                if 'image_url' in repo:
+                    repo_fields['thumbnail_url'] = repo['image_url']
+
+                repositories[repo_id] = {
+                    k: repo_fields.get(k, "") for k in self.REPOSITORY_FIELDS
+                }
+
+            # emit all repositories in a single dump, keeping ArchivesSpace order,
+            # so ArcLight never reads a partially written file
+            with atomic_write(repos_file_path, 'w') as file:
+                yaml.dump(repositories, file, Dumper=SafeDumper, width=2**31 - 1, sort_keys=False)
         else:
             self.log.info(f'File {repos_file_path} is up to date.')
 
 
     def task_digital_object(self, repo, digital_object_id):
-        digital_object = self.client.get(
+        digital_object = json_loads(self.client.get(
             f'{repo["uri"]}/digital_objects/{digital_object_id}',
             params={
                 'resolve': [
@@ -309,19 +478,32 @@ class ArcFlow:
                     'repository',
                     'tree',
                 ],
-            }).json()
+            }).content)
         self.log.info(f'Processing digital object ID {digital_object_id}...')
         omeka_uri = self.omeka.upsert(digital_object)
         if omeka_uri:
             self.log.info(f'Omeka item for digital object ID {digital_object_id}: {omeka_uri}.')
 
 
-    def task_resource(self, repo, resource_id, xml_dir, pdf_dir):
-        resource = self.client.get(
-            f'{repo["uri"]}/resources/{resource_id}',
+    def task_resources(self, repo, resource_ids):
+        """
+        Get a batch of resources of a repository in a single request.
+
+        Returns the time the resources were fetched (in whole seconds, as
+        ArchivesSpace mtimes have no fractional part) and the resources.
+        """
+        fetched_at = math.floor(time.time())
+        resources = json_loads(self.client.get(
+            f'{repo["uri"]}/resources',
             params={
+                'id_set': ','.join(str(resource_id) for resource_id in resource_ids),
                 'resolve': ['classifications', 'classification_terms', 'linked_agents'],
-            }).json()
+            }).content)
+        return (fetched_at, resources)
+
+
+    def task_resource(self, repo, resource, xml_dir, pdf_dir, fetched_at):
+        resource_id = id_from_uri(resource['uri'])
 
         if "ead_id" not in resource:
             self.log.critical(f'Resource {resource_id} is missing an ead_id.')
@@ -332,6 +514,31 @@ class ArcFlow:
         self.log.info(f'Processing "{ead_id}" (resource ID {resource_id})...')
 
         if resource['publish'] and not resource['suppressed']:
+            prev_ead_id = self.get_ead_from_symlink(
+                f'{xml_dir}/{resource_id}.xml')
+            try:
+                xml_file_mtime = os.path.getmtime(xml_file_path)
+            except FileNotFoundError:
+                xml_file_mtime = None
+            # the saved EAD is only reused on incremental runs, forced runs
+            # rebuild every EAD and full runs start from an emptied directory
+            reuse_saved_ead = (not self.force_update
+                and prev_ead_id == resource['ead_id']
+                and xml_file_mtime is not None)
+
+            # skip resources that haven't changed since their EAD was saved
+            if (reuse_saved_ead
+                    and aspace_timestamp(resource['system_mtime']) < xml_file_mtime):
+                self.log.debug(f'"{ead_id}" (resource ID {resource_id}) is up to date, skipping.')
+                return
+
+            # conditional request, for servers that support it, answered
+            # with 304 Not Modified if the saved EAD is still current.
+            # A 304 skips the transforms too, so EADs only affected by
+            # changes to the transforms are rebuilt with --force-update.
+            headers = {}
+            if reuse_saved_ead:
+                headers['If-Modified-Since'] = formatdate(xml_file_mtime, usegmt=True)
             xml = self.client.get(
                 f'{repo["uri"]}/resource_descriptions/{resource_id}.xml',
                 params={
@@ -340,49 +547,55 @@ class ArcFlow:
                     'include_uris': 'true',
                     'numbered_cs': 'true',
                     'ead3': 'false',
-                })
+                },
+                headers=headers)
             repo_id = self.get_repo_id(repo)
+            not_modified = xml.status_code == 304
 
             # add custom XML elements to EAD inside <archdesc level="collection">
             # (record group/subgroup labels and biographical/historical notes)
-            if xml.content:
-                xml_content = xml.content.decode('utf-8')
-
-                # Add arcuit:creator_id attributes (in a custom namespace) to origination name elements
-                # (links creator names in EAD to their corresponding creator records, e.g., in Solr)
-                xml_content = self.xml_transform.add_creator_ids_to_ead(xml_content, resource)
+            if not_modified:
+                xml_content = None
+            elif xml.content:
+                # transforms parse and return the response bytes directly
+                xml_content = xml.content
 
                 # Get record group and subgroup labels
-                rg_label, sg_label = extract_labels(resource)[1:3]
+                rg_label, sg_label = extract_rg_sg_labels(resource)
 
                 # Get biographical/historical notes from creator agents
                 bioghist_content = self.get_creator_bioghist(resource)
 
-                # Inject all collection metadata using XmlTransformService
-                xml_content = self.xml_transform.inject_collection_metadata(
+                # Add arcuit:creator_id attributes (in a custom namespace) to origination name elements
+                # (links creator names in EAD to their corresponding creator records, e.g., in Solr)
+                # and inject all collection metadata, parsing the EAD only once
+                xml_content = self.xml_transform.transform_collection_ead(
                     xml_content,
+                    resource,
                     record_group=rg_label,
                     subgroup=sg_label,
                     bioghist_content=bioghist_content
                 )
-
-                xml_content = xml_content.encode('utf-8')
             else:
                 xml_content = xml.content
 
-            if not (self.skip_pdf_generation or self.dry_run_aspace):
+            # resources can be reported as modified by changes that don't
+            # affect their EAD, unchanged EADs are not saved and reindexed
+            ead_unchanged = not_modified or (reuse_saved_ead
+                and self.file_has_content(xml_file_path, xml_content))
+
+            if (not (self.skip_pdf_generation or self.dry_run_aspace)
+                    and not (ead_unchanged and os.path.isfile(f'{pdf_dir}/{resource["ead_id"]}.pdf'))):
                 pdf_job = self.request_pdf_job(repo['uri'], resource_id)
                 if pdf_job > 0:
                     # pdf files pending to create are named created_repoID_jobID_eadID.pdf
-                    self.create_symlink(
-                        f'{resource["ead_id"]}.pdf',
-                        f'{pdf_dir}/created_{repo_id}_{pdf_job}_{resource["ead_id"]}.pdf'
-                    )
+                    pdf_symlink = f'{pdf_dir}/created_{repo_id}_{pdf_job}_{resource["ead_id"]}.pdf'
+                    self.create_symlink(f'{resource["ead_id"]}.pdf', pdf_symlink)
+                    if self.pdf_job_queue is not None:
+                        self.pdf_job_queue.put(pdf_symlink)
 
             # if the EAD ID was updated in ArchivesSpace,
             # delete the previous EAD in ArcLight Solr
-            prev_ead_id = self.get_ead_from_symlink(
-                f'{xml_dir}/{resource_id}.xml')
             if (prev_ead_id is not None
                     and prev_ead_id != resource['ead_id']):
                 self.delete_ead(
@@ -390,9 +603,21 @@ class ArcFlow:
                     prev_ead_id.replace('.', '-'),  # dashes in Solr
                     f'{xml_dir}/{prev_ead_id}.xml', # dots in filenames
                     f'{pdf_dir}/{prev_ead_id}.pdf')
+                # the previous EAD is only deleted when the queued Solr
+                # deletions are flushed, point the resource ID symlink
+                # to the new EAD right away
+                self.delete_file(f'{xml_dir}/{resource_id}.xml')
+
+            if ead_unchanged:
+                os.utime(xml_file_path, (fetched_at, fetched_at))
+                self.log.info(f'EAD "{ead_id}" (resource ID {resource_id}) is unchanged.')
+                return
 
-            os.makedirs(xml_dir, exist_ok=True)
             self.save_file(xml_file_path, xml_content, 'XML')
+            # date the EAD by when the resource was fetched, so changes made
+            # in ArchivesSpace while it was processed are picked up next time
+            if os.path.isfile(xml_file_path):
+                os.utime(xml_file_path, (fetched_at, fetched_at))
             self.create_symlink(
                 os.path.basename(xml_file_path),
                 f'{os.path.dirname(xml_file_path)}/{resource_id}.xml')
@@ -416,17 +641,17 @@ class ArcFlow:
         digital_objects = set()
         page = 1
         while True:
-            digital_object_components = self.client.get(
+            digital_object_components = json_loads(self.client.get(
                 f'{repo["uri"]}/digital_object_components',
                 params={
                     'page': page,
                     'modified_since': modified_since,
                 }
-            ).json()
+            ).content)
 
             for digital_object_component in digital_object_components['results']:
                 if 'digital_object' in digital_object_component and digital_object_component['digital_object'] is not None:
-                    digital_object_id = int(digital_object_component['digital_object']['ref'].split('/')[-1])
+                    digital_object_id = int(id_from_uri(digital_object_component['digital_object']['ref']))
                     digital_objects.add(digital_object_id)
 
             if digital_object_components['last_page'] == page:
@@ -436,12 +661,12 @@ class ArcFlow:
 
 
     def task_repository(self, repo, modified_since, object_type='resources'):
-        object_list = self.client.get(f'{repo["uri"]}/{object_type}',
+        object_list = json_loads(self.client.get(f'{repo["uri"]}/{object_type}',
             params={
                 'all_ids': True,
                 'modified_since': modified_since,
             }
-        ).json()
+        ).content)
         repo_id = self.get_repo_id(repo)
         if object_type == 'digital_objects':
             # suppressed/deleted digital objects components don't update its
@@ -456,40 +681,128 @@ class ArcFlow:
         return (repo, object_list)
 
 
+    def get_all_pages(self, uri, params):
+        """
+        Get all pages of a paginated ArchivesSpace endpoint, in order.
+        The first page is fetched to find the last page, then the remaining
+        pages are fetched concurrently.
+        """
+        def get_page(page):
+            return json_loads(self.client.get(uri, params={**params, 'page': page}).content)
+
+        first_page = get_page(1)
+        yield first_page
+        if first_page['last_page'] > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_processes) as executor:
+                yield from executor.map(get_page, range(2, first_page['last_page'] + 1))
+
+
     def task_pdf(self, pdf_symlink):
+        """
+        Check the status of the ArchivesSpace PDF job referenced by the
+        symlink and save the PDF once the job is finished.
+
+        Returns the status of the job, or None if its PDF could not be saved
+        and the job is to be checked again.
+        """
         pdf_dir, repo_id, job_id, ead_id = pdf_symlink.split('_')
         #remove the last part of the path to get the pdf_dir
         pdf_dir = '/'.join(pdf_dir.split('/')[:-1])
 
         repo_uri = f'/repositories/{repo_id}'
-        while True:
-            job_status = self.client.get(
-                f'{repo_uri}/jobs/{job_id}').json().get('status', '')
-
-            if job_status in ('completed', 'canceled', 'failed'):
-                if job_status == 'completed':
-                    file_id = self.client.get(
-                        f'{repo_uri}/jobs/{job_id}/output_files').json()[0]
-
-                    pdf = self.client.get(
-                        f'{repo_uri}/jobs/{job_id}/output_files/{file_id}')
-                elif job_status in ('canceled', 'failed'):
-                    self.log.error(f'ArchivesSpace {self.job_type}_{job_id} {job_status}.')
-                    pdf = None
-
-                if hasattr(pdf, 'content'):
-                    pdf_content = pdf.content
-                else:
-                    pdf_content = b''   # empty PDF file
+        job_status = json_loads(self.client.get(
+            f'{repo_uri}/jobs/{job_id}').content).get('status', '')
+
+        if job_status in self.PDF_JOB_FINISHED_STATUSES:
+            if job_status == 'completed':
+                file_id = json_loads(self.client.get(
+                    f'{repo_uri}/jobs/{job_id}/output_files').content)[0]
+
+                pdf = self.client.get(
+                    f'{repo_uri}/jobs/{job_id}/output_files/{file_id}',
+                    stream=True)
+            elif job_status in ('canceled', 'failed'):
+                self.log.error(f'ArchivesSpace {self.job_type}_{job_id} {job_status}.')
+                pdf = None
+
+            if pdf is not None:
+                # stream the PDF body to disk instead of buffering it in memory
+                with pdf:
+                    saved = self.save_file(f'{pdf_dir}/{ead_id}', pdf, 'PDF')
+            else:
+                saved = self.save_file(f'{pdf_dir}/{ead_id}', b'', 'PDF')   # empty PDF file
+            if not saved:
+                # keep the job pending, so the PDF is downloaded again
+                return None
+            os.replace(pdf_symlink, pdf_symlink.replace('created_', f'{job_status}_'))
 
-                os.makedirs(pdf_dir, exist_ok=True)
-                self.save_file(f'{pdf_dir}/{ead_id}', pdf_content, 'PDF')
-                os.replace(pdf_symlink, pdf_symlink.replace('created_', f'{job_status}_'))
+            return job_status
 
-                return True
+        self.log.info(f'Waiting for ArchivesSpace {self.job_type}_{job_id} to complete... (current status: {job_status})')
+        return job_status
+
+
+    def poll_pdf_jobs(self, executor, pdf_symlinks, pdf_job_queue=None):
+        """
+        Poll all pending ArchivesSpace PDF jobs together until they finish.
+
+        Each round checks every pending job concurrently on the executor and
+        then sleeps once, instead of each job holding a worker thread while
+        it sleeps between its own status checks. The wait between rounds
+        backs off exponentially while no job changes status, so long-running
+        jobs are polled less often, and starts over when any job progresses.
+
+        With a pdf_job_queue, jobs put in the queue are added to the polled
+        jobs as they are requested, until None is put in the queue.
+
+        A job whose status check fails is checked again in the next round.
+        Jobs still unfinished after PDF_JOB_TIMEOUT seconds are no longer
+        polled; their created_ symlinks are left for the next run to poll.
+        """
+        statuses = dict.fromkeys(pdf_symlinks)
+        deadlines = dict.fromkeys(pdf_symlinks, time.monotonic() + self.PDF_JOB_TIMEOUT)
+        delay = self.PDF_POLL_INITIAL_DELAY
+        queue_open = pdf_job_queue is not None
+        while statuses or queue_open:
+            # wait for new jobs only when there are no pending jobs to poll
+            block = not statuses
+            while queue_open:
+                try:
+                    pdf_symlink = pdf_job_queue.get(block=block)
+                except queue.Empty:
+                    break
+                block = False
+                if pdf_symlink is None:
+                    queue_open = False
+                else:
+                    statuses[pdf_symlink] = None
+                    deadlines[pdf_symlink] = time.monotonic() + self.PDF_JOB_TIMEOUT
+            if not statuses:
+                break
 
-            self.log.info(f'Waiting for ArchivesSpace {self.job_type}_{job_id} to complete... (current status: {job_status})')
-            time.sleep(5)
+            futures = {executor.submit(self.task_pdf, pdf_symlink): pdf_symlink
+                       for pdf_symlink in statuses}
+            changed = False
+            for future, pdf_symlink in futures.items():
+                try:
+                    job_status = future.result()
+                except Exception as e:
+                    self.log.error(f'Error checking PDF job "{pdf_symlink}": {e}')
+                    job_status = statuses[pdf_symlink]
+                changed = changed or job_status != statuses[pdf_symlink]
+                if job_status in self.PDF_JOB_FINISHED_STATUSES:
+                    del statuses[pdf_symlink]
+                    del deadlines[pdf_symlink]
+                elif time.monotonic() >= deadlines[pdf_symlink]:
+                    self.log.warning(f'Giving up on PDF job "{pdf_symlink}" (current status: {job_status}), left for the next run.')
+                    del statuses[pdf_symlink]
+                    del deadlines[pdf_symlink]
+                else:
+                    statuses[pdf_symlink] = job_status
+            if statuses:
+                delay = self.PDF_POLL_INITIAL_DELAY if changed else min(delay * 1.5, self.PDF_POLL_MAX_DELAY)
+                self.log.info(f'Waiting for {len(statuses)} ArchivesSpace {self.job_type}s to complete...')
+                time.sleep(delay)
 
 
     def process_digital_objects(self, num_processes, modified_since):
@@ -497,29 +810,31 @@ class ArcFlow:
         self.log.info('Fetching digital objects from ArchivesSpace...')
 
         if self.repository_id is not None:
-            repo = self.client.get(f'/repositories/{self.repository_id}')
-            repos = [repo.json()] if repo else []
+            repos = [
+                repo for repo in self.get_repositories()
+                if self.get_repo_id(repo) == str(self.repository_id)]
         else:
-            repos = self.client.get('repositories').json()
+            repos = self.get_repositories()
 
-        with (Pool(processes=num_processes) as pool):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_processes) as executor:
             self.last_updated_digital_objects = datetime.fromtimestamp(int(time.time()), timezone.utc)
             # Tasks for processing repositories for digital objects
-            results_repositories = [pool.apply_async(
-                self.task_repository,
-                args=(repo, modified_since, 'digital_objects'))
+            futures_repositories = [executor.submit(
+                self.task_repository, repo, modified_since, 'digital_objects')
                 for repo in repos]
-            # Collect outputs from repository tasks
-            outputs_repositories = [r.get() for r in results_repositories]
-
-            # Tasks for processing digital objects
-            results_digital_objects = [pool.apply_async(
-                self.task_digital_object, 
-                args=(repo, digital_object_id)) 
-                for repo, digital_objects in outputs_repositories for digital_object_id in digital_objects]
+
+            # Tasks for processing digital objects, dispatched as soon as each
+            # repository listing is available
+            futures_digital_objects = []
+            for future in concurrent.futures.as_completed(futures_repositories):
+                repo, digital_objects = future.result()
+                futures_digital_objects.extend(executor.submit(
+                    self.task_digital_object, repo, digital_object_id)
+                    for digital_object_id in digital_objects)
+
             # Wait for digital objects tasks to complete
-            for r in results_digital_objects:
-                r.get()
+            for future in concurrent.futures.as_completed(futures_digital_objects):
+                future.result()
 
 
     def process_collections(self, num_processes, modified_since):
@@ -535,67 +850,153 @@ class ArcFlow:
         self.log.info('Fetching resources from ArchivesSpace...')
 
         if self.repository_id is not None:
-            repo = self.client.get(f'/repositories/{self.repository_id}')
-            repos = [repo.json()] if repo else []
+            repos = [
+                repo for repo in self.get_repositories()
+                if self.get_repo_id(repo) == str(self.repository_id)]
             repo_wildcard = self.repository_id
         else:
-            repos = self.client.get('repositories').json()
+            repos = self.get_repositories()
             repo_wildcard = '*'
 
-        with (Pool(processes=num_processes) as pool):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_processes) as executor, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=1) as poller:
             self.last_updated_collections = datetime.fromtimestamp(int(time.time()), timezone.utc)
-            # Tasks for processing repositories for resources
-            results_repositories = [pool.apply_async(
-                self.task_repository,
-                args=(repo, modified_since, 'resources'))
-                for repo in repos]
-            # Collect outputs from repository tasks
-            outputs_repositories = [r.get() for r in results_repositories]
-
-            if not self.skip_resource_processing:
-                # Tasks for processing resources
-                results_resources = [pool.apply_async(
-                    self.task_resource,
-                    args=(repo, resource_id, resource_dir, pdf_dir))
-                    for repo, resources in outputs_repositories for resource_id in resources]
-                # Wait for resource tasks to complete
-                for r in results_resources:
-                    r.get()
+
+            future_pdf_jobs = None
+            if not self.skip_pdf_generation:
+                # Poll the PDF jobs pending from previous runs and the ones
+                # requested by task_resource while the resources are processed
+                self.pdf_job_queue = queue.Queue()
+                future_pdf_jobs = poller.submit(self.poll_pdf_jobs, executor, [
+                    pdf_entry.path
+                    for pdf_entry in os.scandir(pdf_dir) if pdf_entry.is_symlink() and re.match(rf'created_{repo_wildcard}_.*\.pdf', pdf_entry.name)],
+                    self.pdf_job_queue)
             else:
-                self.log.info('Skipping processing of resources (--skip-resource-processing flag set).')
+                self.log.info('Skipping PDF generation (--skip-pdf-generation flag set).')
+
+            try:
+                # Tasks for processing repositories for resources
+                futures_repositories = [executor.submit(
+                    self.task_repository, repo, modified_since, 'resources')
+                    for repo in repos]
+
+                # Tasks for indexing the EADs of each repository
+                futures_indexing = []
+                deleted_any = False
+                # errors raised by resource tasks, raised once the other
+                # resources are processed and indexed
+                resource_errors = []
+                def submit_indexing(repo_id):
+                    if not self.skip_collection_indexing:
+                        futures_indexing.append(executor.submit(
+                            self.index_collections, repo_id, resource_dir))
+
+                if not self.skip_resource_processing:
+                    # Tasks for processing resources, dispatched as soon as each
+                    # repository listing is available so that the resources of the
+                    # first repositories are processed while the others are fetched.
+                    # Resources are fetched in batches of resources_batch_size, and
+                    # batches are only fetched while fewer than
+                    # max_resources_in_flight resources are waiting to be processed,
+                    # so memory use is bound by the number of workers instead of
+                    # the number of modified resources.
+                    max_resources_in_flight = max(2, num_processes) * self.resources_batch_size
+                    resources_in_flight = 0
+                    pending_resources = {}
+                    queued_batches = deque()
+                    futures_batches = {}
+                    futures_resources = {}
+                    not_done = set(futures_repositories)
+                    while not_done:
+                        done, not_done = concurrent.futures.wait(
+                            not_done, return_when=concurrent.futures.FIRST_COMPLETED)
+                        for future in done:
+                            if future in futures_resources:
+                                repo_id = futures_resources.pop(future)
+                                try:
+                                    future.result()
+                                except Exception as e:
+                                    self.log.critical(f'Error processing resource of repository {repo_id}: {e}')
+                                    resource_errors.append(e)
+                                resources_in_flight -= 1
+                                pending_resources[repo_id] -= 1
+                            elif future in futures_batches:
+                                repo, batch_size = futures_batches.pop(future)
+                                repo_id = self.get_repo_id(repo)
+                                try:
+                                    fetched_at, resources = future.result()
+                                except Exception as e:
+                                    self.log.critical(f'Error fetching resources of repository {repo_id}: {e}')
+                                    resource_errors.append(e)
+                                    resources = []
+                                # resources missing from the batch are not processed
+                                resources_in_flight -= batch_size - len(resources)
+                                pending_resources[repo_id] -= batch_size - len(resources)
+                                for resource in resources:
+                                    future_resource = executor.submit(
+                                        self.task_resource, repo, resource, resource_dir, pdf_dir, fetched_at)
+                                    futures_resources[future_resource] = repo_id
+                                    not_done.add(future_resource)
+                            else:
+                                repo, resource_ids = future.result()
+                                repo_id = self.get_repo_id(repo)
+                                pending_resources[repo_id] = len(resource_ids)
+                                queued_batches.extend(
+                                    (repo, resource_ids[i:i + self.resources_batch_size])
+                                    for i in range(0, len(resource_ids), self.resources_batch_size))
+
+                            # Index each repository as soon as all its resources are
+                            # processed, while the resources of the others are still processed
+                            if pending_resources[repo_id] == 0:
+                                # delete the EADs of unpublished resources and previous
+                                # EAD IDs from ArcLight Solr before indexing, committed
+                                # along with the indexing
+                                deleted_any = self.flush_solr_deletes(commit=False) > 0 or deleted_any
+                                submit_indexing(repo_id)
+
+                        while queued_batches and resources_in_flight < max_resources_in_flight:
+                            repo, resource_ids = queued_batches.popleft()
+                            future_batch = executor.submit(self.task_resources, repo, resource_ids)
+                            futures_batches[future_batch] = (repo, len(resource_ids))
+                            resources_in_flight += len(resource_ids)
+                            not_done.add(future_batch)
+                else:
+                    for future in futures_repositories:
+                        future.result()
+                    self.log.info('Skipping processing of resources (--skip-resource-processing flag set).')
+                    for repo in repos:
+                        submit_indexing(self.get_repo_id(repo))
+            finally:
+                if self.pdf_job_queue is not None:
+                    # no more PDF jobs are requested
+                    self.pdf_job_queue.put(None)
+                    self.pdf_job_queue = None
 
             has_indexed_any = False
             if not self.skip_collection_indexing:
-                results_indexing = [pool.apply_async(
-                    self.index_collections,
-                    args=(self.get_repo_id(repo), resource_dir))
-                    for repo in repos]
                 # Wait for indexing tasks to complete
-                for r in results_indexing:
-                    if r.get() and not has_indexed_any:
+                for future in futures_indexing:
+                    if future.result() and not has_indexed_any:
                         has_indexed_any = True
-                if has_indexed_any:
-                    # commit after all indexing tasks are done to optimize performance
-                    results_commit = pool.apply_async(self.commit_arclight_solr)
             else:
                 self.log.info('Skipping indexing of collections (--skip-collection-indexing flag set).')
 
-            if not self.skip_pdf_generation:
-                # Tasks for processing PDFs
-                results_pdf = [pool.apply_async(
-                    self.task_pdf,
-                    args=(pdf_entry.path,))
-                    for pdf_entry in os.scandir(pdf_dir) if pdf_entry.is_symlink() and re.match(rf'created_{repo_wildcard}_.*\.pdf', pdf_entry.name)]
-                # Wait for PDF tasks to complete
-                for r in results_pdf:
-                    r.get()
-            else:
-                self.log.info('Skipping PDF generation (--skip-pdf-generation flag set).')
+            future_commit = None
+            if has_indexed_any or deleted_any:
+                # commit after all indexing and deletion tasks are done to optimize performance
+                future_commit = executor.submit(self.commit_arclight_solr)
+
+            if future_pdf_jobs is not None:
+                # Wait for all the pending PDF jobs to finish
+                future_pdf_jobs.result()
 
-            if not self.skip_collection_indexing and has_indexed_any:
+            if future_commit is not None:
                 # Wait commit to complete
-                results_commit.get()
+                future_commit.result()
 
+        if resource_errors:
+            # signal the failure so that the config timestamps are not updated
+            raise resource_errors[0]
         return
 
 
@@ -625,21 +1026,12 @@ class ArcFlow:
         else:
             scope, modified_since = next(iter(modified_since_scope.items())) 
 
-        object_pattern = r'^/repositories/(?P<repo_id>\d+)/(?P<object_type>resources|digital_objects)/(?P<record_id>\d+)$'
-        agent_pattern = r'^/agents/(?P<agent_type>people|corporate_entities|families)/(?P<record_id>\d+)$'
-
-        page = 1
-        while True:
-            deleted_records = self.client.get(
+        for deleted_records in self.get_all_pages(
                 '/delete-feed-restricted',
-                params={
-                    'page': page,
-                    'modified_since': modified_since,
-                }
-            ).json()
+                {'modified_since': modified_since}):
             for record in deleted_records['results']:
-                object_match = re.match(object_pattern, record)
-                agent_match = re.match(agent_pattern, record)
+                object_match = deleted_object_pattern.match(record)
+                agent_match = None if object_match else deleted_agent_pattern.match(record)
 
                 if object_match and scope in ('collections', 'digital_objects','all'):
                     object_id = object_match.group('record_id')
@@ -668,22 +1060,30 @@ class ArcFlow:
                     agent_solr_id = f'creator_{agent_type}_{agent_id}'
                     self.delete_creator(file_path, agent_solr_id)
 
-            if deleted_records['last_page'] == page:
-                break
-            page += 1
+        # delete the EADs and creators of the deleted records from ArcLight Solr
+        self.flush_solr_deletes()
 
+    def get_gem_path(self, gem_name):
+        """
+        Get the installation path of a gem in the ArcLight bundle.
+        `bundle show` boots Bundler, so the path is looked up once per run.
+        """
+        with self.gem_paths_lock:
+            if gem_name not in self.gem_paths:
+                result_show = subprocess.run(
+                    ['bundle', 'show', gem_name],
+                    capture_output=True,
+                    text=True,
+                    cwd=self.arclight_dir
+                )
+                self.gem_paths[gem_name] = result_show.stdout.strip() if result_show.returncode == 0 else ''
+            return self.gem_paths[gem_name]
 
     def index_collections(self, repo_id, xml_dir):
         """Index collection XML files to Solr using traject."""
         try:
             # Get arclight traject config path
-            result_show = subprocess.run(
-                ['bundle', 'show', 'arclight'],
-                capture_output=True,
-                text=True,
-                cwd=self.arclight_dir
-            )
-            arclight_path = result_show.stdout.strip() if result_show.returncode == 0 else ''
+            arclight_path = self.get_gem_path('arclight')
 
             if not arclight_path:
                 self.log.critical(f'Could not find arclight gem path')
@@ -691,22 +1091,20 @@ class ArcFlow:
 
             traject_config = f'{arclight_path}/lib/arclight/traject/ead2_config.rb'
 
+            # scan the directory once for all the pending resources of the
+            # repository, none are added while the repository is indexed
+            with os.scandir(xml_dir) as dir_iterator:
+                pending_files = [
+                    xml_file.path for xml_file in dir_iterator
+                    if (xml_file.is_symlink()
+                        and xml_file.name.startswith(f'created_{repo_id}_'))]
+
             batch = 0
             has_indexed_any = False
-            while True:
-                xml_files = []
-                for xml_file in os.scandir(xml_dir):
-                    if (xml_file.is_symlink()
-                            and xml_file.name.startswith(f'created_{repo_id}_')):
-                        xml_files.append(xml_file.path)
-                        if len(xml_files) >= self.batch_size:
-                            break
-
-                if len(xml_files) > 0:
-                    batch += 1
-                    self.log.info(f'Indexing batch {batch} with {len(xml_files)} pending resources in repository ID {repo_id} to ArcLight Solr...')
-                else:
-                    return has_indexed_any  # exit the loop if no pending resources are found
+            for i in range(0, len(pending_files), self.batch_size):
+                xml_files = pending_files[i:i + self.batch_size]
+                batch += 1
+                self.log.info(f'Indexing batch {batch} with {len(xml_files)} pending resources in repository ID {repo_id} to ArcLight Solr...')
 
                 cmd = [
                     'bundle', 'exec', 'traject',
@@ -740,9 +1138,15 @@ class ArcFlow:
                 else:
                     self.log.info(f'Finished indexing batch {batch} with {len(xml_files)} pending resources in repository ID {repo_id} to ArcLight Solr.')
                     for xml_file in xml_files:
-                       os.replace(xml_file, xml_file.replace('created_', 'completed_'))
+                        dir_path, file_name = os.path.split(xml_file)
+                        completed_file = os.path.join(dir_path, file_name.replace('created_', 'completed_', 1))
+                        os.replace(xml_file, completed_file)
+                        self.update_dir_entry(xml_file, deleted=True)
+                        self.update_dir_entry(completed_file, os.readlink(completed_file))
                     if not has_indexed_any:
                         has_indexed_any = True
+
+            return has_indexed_any
         except subprocess.CalledProcessError as e:
             self.log.critical(f'Error indexing batch {batch} with {len(xml_files)} pending resources in repository ID {repo_id} to ArcLight Solr: {e}')
 
@@ -848,11 +1252,11 @@ class ArcFlow:
         try:
             # First, get the total count of matching documents
             count_params = {'q': query_string, 'rows': 0, 'wt': 'json'}
-            count_response = requests.get(f'{solr_url}/select', params=count_params)
+            count_response = self.solr_session.get(f'{solr_url}/select', params=count_params)
             self.log.info(f"  [Solr Count Request]: {count_response.request.url}")
 
             count_response.raise_for_status()
-            num_found = count_response.json()['response']['numFound']
+            num_found = json_loads(count_response.content)['response']['numFound']
 
             if num_found == 0:
                 return [] # No need to query again if nothing was found
@@ -864,12 +1268,12 @@ class ArcFlow:
                 'fl': ','.join(fields), # Join field list into a comma-separated string
                 'wt': 'json'
             }
-            response = requests.get(f'{solr_url}/select', params=data_params)
+            response = self.solr_session.get(f'{solr_url}/select', params=data_params)
             response.raise_for_status()
             # Log the exact URL for the data request
             self.log.info(f"  [Solr Data Request]: {response.request.url}")
 
-            return response.json()['response']['docs']
+            return json_loads(response.content)['response']['docs']
 
         except requests.exceptions.RequestException as e:
             self.log.critical(f"Failed to execute Solr query: {e}")
@@ -963,7 +1367,6 @@ class ArcFlow:
 
             # Save EAC-CPF XML to file
             filename = f'{agents_dir}/{creator_id}.xml'
-            os.makedirs(agents_dir, exist_ok=True)
             with open(filename, 'w', encoding='utf-8') as f:
                 f.write(eac_cpf_xml)
 
@@ -1018,7 +1421,7 @@ class ArcFlow:
             traject_config = self.find_eac_cpf_config()
             if traject_config:
                 self.log.info(f'Using traject config: {traject_config}')
-                indexed = self.index_creators(agents_dir, creator_ids)
+                indexed = self.index_creators(agents_dir, creator_ids, traject_config)
                 self.log.info(f'Creator indexing complete: {indexed}/{len(creator_ids)} indexed')
             else:
                 self.log.warning(f'Skipping creator indexing (traject config not found)')
@@ -1048,15 +1451,9 @@ class ArcFlow:
         self.log.info('Searching for eac_cpf_config.rb...')
 
         # Try 1: Check arclight directory
-        result_show = subprocess.run(
-            ['bundle', 'show', 'arcuit'],
-            capture_output=True,
-            text=True,
-            cwd=self.arclight_dir
-        )
-        arcuit_dir = result_show.stdout.strip()
+        arcuit_dir = self.get_gem_path('arcuit')
         traject_config = os.path.join(arcuit_dir, 'lib', 'arcuit', 'traject', 'eac_cpf_config.rb')
-        if os.path.exists(traject_config):
+        if arcuit_dir and os.path.exists(traject_config):
            self.log.info(f'✓ Using traject config from arclight: {traject_config}')
            return traject_config
 
@@ -1080,19 +1477,21 @@ class ArcFlow:
         return None
 
 
-    def index_creators(self, agents_dir, creator_ids, batch_size=100):
+    def index_creators(self, agents_dir, creator_ids, traject_config=None, batch_size=100):
         """
         Index creator XML files to Solr using traject.
 
         Args:
             agents_dir: Directory containing creator XML files
             creator_ids: List of creator IDs to index
+            traject_config: Path to the traject config (default: find_eac_cpf_config)
             batch_size: Number of files to index per traject call (default: 100)
 
         Returns:
             int: Number of successfully indexed creators
         """
-        traject_config = self.find_eac_cpf_config()
+        if traject_config is None:
+            traject_config = self.find_eac_cpf_config()
         if not traject_config:
             return 0
 
@@ -1160,40 +1559,59 @@ class ArcFlow:
         """
         Get the repository ID from the repository URI.
         """
-        return repo['uri'].split('/')[-1]
+        return id_from_uri(repo['uri'])
 
 
-    def get_ead_id_from_file(self, xml_file_path):
+    def get_ead_from_symlink(self, symlink_path):
         """
-        Get the EAD ID from the XML file.
+        Get the EAD ID from the symlink file.
         """
         ead_id = None
-        # parse the file to get the ead_id
-        if os.path.isfile(xml_file_path):
-            ead = parse(xml_file_path)
-            for event, node in ead:
-                if event == START_ELEMENT and node.tagName == 'eadid':
-                    ead.expandNode(node)
-                    ead_id = node.firstChild.nodeValue
-                    break
+        dir_path, symlink_name = os.path.split(os.path.normpath(symlink_path))
+        with self.dir_entries_lock:
+            entries = self.get_dir_entries(dir_path)
+            target = entries.get(symlink_name)
+            # only symlinks to an existing file in the same directory
+            if target is not None and target in entries:
+                ead_id = os.path.splitext(target)[0]
 
         return ead_id
 
 
-    def get_ead_from_symlink(self, symlink_path):
+    def get_dir_entries(self, dir_path):
         """
-        Get the EAD ID from the symlink file.
+        Get the entries of a directory as a dictionary of file names to
+        symlink targets (None for regular files). The directory is scanned
+        once, then kept up to date by save_file, create_symlink and
+        delete_file. Must be called with dir_entries_lock held.
         """
-        ead_id = None
-        if os.path.isfile(symlink_path):
-            real_path = os.path.realpath(symlink_path)
-            ead_id = os.path.splitext(os.path.basename(real_path))[0]
+        if dir_path not in self.dir_entries:
+            entries = {}
+            if os.path.isdir(dir_path):
+                with os.scandir(dir_path) as dir_iterator:
+                    for entry in dir_iterator:
+                        entries[entry.name] = os.readlink(entry.path) if entry.is_symlink() else None
+            self.dir_entries[dir_path] = entries
+        return self.dir_entries[dir_path]
 
-        return ead_id
+
+    def update_dir_entry(self, file_path, target=None, deleted=False):
+        """
+        Record a created or deleted file in the scanned directory entries.
+        """
+        dir_path, file_name = os.path.split(os.path.normpath(file_path))
+        with self.dir_entries_lock:
+            entries = self.dir_entries.get(dir_path)
+            if entries is None:
+                return
+            if deleted:
+                entries.pop(file_name, None)
+            else:
+                entries[file_name] = target
 
 
     def request_pdf_job(self, repo_uri, resource_id):
-        job = self.client.post(
+        job = json_loads(self.client.post(
             f'{repo_uri}/jobs',
             json={
                 'job': {
@@ -1203,37 +1621,94 @@ class ArcFlow:
                     'include_unpublished': False,
                 }
             }
-        ).json()
+        ).content)
         self.log.info(f'{job["status"]} ArchivesSpace {self.job_type}_{job["id"]} for resource ID {resource_id}.')
         return job["id"]
 
 
     def save_file(self, file_path, content, label):
+        """
+        Save content to a file.
+
+        content can be bytes or a requests.Response fetched with stream=True,
+        in which case the body is written in chunks as it is received. The
+        file is written with atomic_write, so an interrupted write never
+        leaves a partial EAD or PDF behind.
+        """
         try:
-            with open(file_path, 'wb') as file:
-                file.write(content)
-                self.log.info(f'Saved {label} file {file_path}.')
-                return True
+            with atomic_write(file_path) as file:
+                if isinstance(content, requests.Response):
+                    for chunk in content.iter_content(chunk_size=1024 * 1024):
+                        file.write(chunk)
+                else:
+                    file.write(content)
+            self.log.info(f'Saved {label} file {file_path}.')
+            self.update_dir_entry(file_path)
+            return True
         except Exception as e:
             self.log.critical(f'Error writing to {label} file {file_path}: {e}')
             return False
 
 
+    def file_has_content(self, file_path, content):
+        """
+        Check if a file exists and contains exactly the given bytes.
+        """
+        try:
+            if os.path.getsize(file_path) != len(content):
+                return False
+            with open(file_path, 'rb') as file:
+                return file.read() == content
+        except FileNotFoundError:
+            return False
+
+
     def create_symlink(self, target_path, symlink_path):
+        """
+        Create or atomically replace a symlink. Returns False if the symlink
+        is already known to point to target_path.
+        """
+        dir_path, symlink_name = os.path.split(os.path.normpath(symlink_path))
+        with self.dir_entries_lock:
+            if self.dir_entries.get(dir_path, {}).get(symlink_name) == target_path:
+                return False
+
+        # create the symlink under a temporary name and rename it into place,
+        # so an existing symlink is replaced without a window where it's missing
+        tmp_symlink_path = os.path.join(dir_path, f'.{symlink_name}.{threading.get_ident()}.tmp')
         try:
-            os.symlink(target_path, symlink_path)
-            self.log.info(f'Created symlink {symlink_path} -> {target_path}.')
-            return True
-        except FileExistsError as e:
-            self.log.info(e)
+            try:
+                os.symlink(target_path, tmp_symlink_path)
+            except FileExistsError:
+                # left behind by an interrupted run, as thread idents are reused
+                os.remove(tmp_symlink_path)
+                os.symlink(target_path, tmp_symlink_path)
+            os.replace(tmp_symlink_path, symlink_path)
+        except OSError as e:
+            self.log.error(f'Error creating symlink {symlink_path} -> {target_path}: {e}')
+            try:
+                os.remove(tmp_symlink_path)
+            except FileNotFoundError:
+                pass
             return False
+        self.update_dir_entry(symlink_path, target_path)
+        self.log.info(f'Created symlink {symlink_path} -> {target_path}.')
+        return True
 
     def commit_arclight_solr(self):
+        if self.solr_commits_held:
+            # committed by run_all once every workflow has finished
+            self.solr_commit_pending = True
+            self.log.info('Deferring ArcLight Solr commit until all workflows finish.')
+            return True
         self.log.info('Committing changes to ArcLight Solr...')
         try:
-            response = requests.get(
+            response = self.solr_session.get(
                 f'{self.solr_url}/update?commit=true&openSearcher=true')
             if response.status_code == 200:
+                # the commit covers every change made before it was sent,
+                # failed commits leave the changes pending
+                self.solr_commit_pending = False
                 self.log.info('Finished committing changes to ArcLight Solr.')
                 return True
             else:
@@ -1243,11 +1718,17 @@ class ArcFlow:
             self.log.critical(f'Error committing changes to ArcLight Solr: {e}')
             return False
 
-    def delete_arclight_solr_record(self, solr_record_id):
+    def delete_arclight_solr_record(self, solr_record_id, commit=True):
+        """
+        Delete a record from ArcLight Solr. solr_record_id can also be a list
+        of record IDs, which are deleted in a single request. With
+        commit=False the deletion is left to be committed by a later commit.
+        """
         try:
-            response = requests.post(
-                f'{self.solr_url}/update?commit=true',
-                json={'delete': {'id': solr_record_id}},
+            response = self.solr_session.post(
+                f'{self.solr_url}/update?commit={"true" if commit else "false"}',
+                data=json_dumps({'delete': solr_record_id if isinstance(solr_record_id, list) else {'id': solr_record_id}}),
+                headers={'Content-Type': 'application/json'},
             )
             if response.status_code == 200:
                 self.log.info(f'Deleted Solr record {solr_record_id}. from ArcLight Solr')
@@ -1262,28 +1743,108 @@ class ArcFlow:
     def delete_file(self, file_path):
         try:
             os.remove(file_path)
+            self.update_dir_entry(file_path, deleted=True)
             self.log.info(f'Deleted file {file_path}.')
         except FileNotFoundError:
+            self.update_dir_entry(file_path, deleted=True)
             self.log.error(f'File {file_path} not found.')
 
     def delete_ead(self, resource_id, ead_id, xml_file_path, pdf_file_path):
-        # delete from solr
-        deleted_solr_record = self.delete_arclight_solr_record(ead_id)
-        if deleted_solr_record:
-            self.delete_file(pdf_file_path)
-            self.delete_file(xml_file_path)
-            # delete symlink if exists
-            symlink_path = f'{os.path.dirname(xml_file_path)}/{resource_id}.xml'
-            self.delete_file(symlink_path)
+        """
+        Queue an EAD to be deleted from ArcLight Solr, along with its XML,
+        PDF and resource ID symlink files.
+        """
+        self.queue_solr_delete(
+            ead_id,
+            (xml_file_path, pdf_file_path),
+            f'{os.path.dirname(xml_file_path)}/{resource_id}.xml')
 
     def delete_creator(self, file_path, solr_id):
-        deleted_solr_record = self.delete_arclight_solr_record(solr_id)
-        if deleted_solr_record:
-            self.delete_file(file_path)
+        """
+        Queue a creator to be deleted from ArcLight Solr, along with its
+        EAC-CPF file.
+        """
+        self.queue_solr_delete(solr_id, (file_path,))
+
+    def queue_solr_delete(self, solr_id, file_paths, symlink_path=None):
+        """
+        Queue a record to be deleted from ArcLight Solr. Its files are deleted
+        once the record is deleted from Solr by flush_solr_deletes, and
+        symlink_path only if it still points to the first of file_paths.
+        """
+        with self.solr_deletes_lock:
+            self.pending_solr_deletes.append((solr_id, file_paths, symlink_path))
+
+    def flush_solr_deletes(self, commit=True):
+        """
+        Delete all queued records from ArcLight Solr in a single request and,
+        if it succeeds, delete their files. With commit=False the deletions
+        are left to be committed by a later commit.
+
+        Returns the number of records deleted from Solr.
+        """
+        with self.solr_deletes_lock:
+            pending_deletes = self.pending_solr_deletes
+            self.pending_solr_deletes = []
+        if not pending_deletes:
+            return 0
+
+        # delete from solr
+        deleted_solr_records = self.delete_arclight_solr_record(
+            [solr_id for solr_id, _, _ in pending_deletes], commit)
+        if not deleted_solr_records:
+            return 0
+        else:
+            for _, file_paths, symlink_path in pending_deletes:
+                # delete symlink if it still points to the deleted file
+                if (symlink_path is not None
+                        and self.get_ead_from_symlink(symlink_path)
+                        == os.path.splitext(os.path.basename(file_paths[0]))[0]):
+                    self.delete_file(symlink_path)
+                for file_path in file_paths:
+                    self.delete_file(file_path)
+        return len(pending_deletes)
+
+    def load_config_file(self):
+        """
+        Load the last updated timestamps from the .arcflow.json file, falling
+        back to the legacy .arcflow.yml file if it doesn't exist yet.
+
+        Raises FileNotFoundError if neither file exists.
+        """
+        try:
+            with open(self.arcflow_file_path, 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return load_yaml_file(self.arcflow_yaml_file_path) or {}
+
+
+    def parse_config_timestamp(self, value):
+        """
+        Convert a last updated timestamp from the config file to a datetime.
+        .arcflow.json stores seconds since the epoch, the legacy .arcflow.yml
+        stores formatted dates. Missing timestamps default to the epoch, and
+        dates without an offset are taken as UTC.
+        """
+        if not value:
+            return datetime.fromtimestamp(0, timezone.utc)
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                # offsets without a colon (+0000) need Python 3.11+ fromisoformat
+                value = datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+        if isinstance(value, datetime):
+            # YAML also loads unquoted dates as datetimes
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return value
+        return datetime.fromtimestamp(value, timezone.utc)
+
 
     def save_config_file(self, scope):
         """
-        Save the last updated timestamps to the .arcflow.yml file.
+        Save the last updated timestamps to the .arcflow.json file.
         Each type (collections, creators, digital_objects) has its own timestamp so they
         can be run independently without overwriting each other's state.
 
@@ -1291,30 +1852,34 @@ class ArcFlow:
             Determines which timestamps are updated based on which record types are in scope.
         """
         if self.skip_timestamp_update:
-            self.log.info('Skipping update of .arcflow.yml configuration file. (--skip-timestamp-update flag set)')
+            self.log.info('Skipping update of .arcflow.json configuration file. (--skip-timestamp-update flag set)')
             return
 
         try:
             # Preserve timestamps for record types not processed in this run
             try:
-                with open(self.arcflow_file_path, 'r') as file:
-                    config = yaml.safe_load(file) or {}
+                config = self.load_config_file()
             except FileNotFoundError:
                 config = {}
             config.pop('last_updated', None)  # remove legacy single key if present
+            # convert timestamps read from the legacy .arcflow.yml file
+            config = {
+                key: int(self.parse_config_timestamp(value).timestamp())
+                for key, value in config.items()
+            }
 
             if scope in ('collections', 'all'):
-                config['last_updated_collections'] = self.last_updated_collections.strftime('%Y-%m-%dT%H:%M:%S%z')
+                config['last_updated_collections'] = int(self.last_updated_collections.timestamp())
             if scope in ('creators', 'all'):
-                config['last_updated_creators'] = self.last_updated_creators.strftime('%Y-%m-%dT%H:%M:%S%z')
+                config['last_updated_creators'] = int(self.last_updated_creators.timestamp())
             if scope in ('digital_objects', 'all'):
-                config['last_updated_digital_objects'] = self.last_updated_digital_objects.strftime('%Y-%m-%dT%H:%M:%S%z')
+                config['last_updated_digital_objects'] = int(self.last_updated_digital_objects.timestamp())
 
             with open(self.arcflow_file_path, 'w') as file:
-                yaml.dump(config, file)
-                self.log.info(f'Saved file .arcflow.yml.')
+                json.dump(config, file)
+                self.log.info(f'Saved file .arcflow.json.')
         except Exception as e:
-            self.log.error(f'Error writing to file .arcflow.yml: {e}')
+            self.log.error(f'Error writing to file .arcflow.json: {e}')
 
 
     def run_digital_objects(self, modified_since, num_processes):
@@ -1343,16 +1908,23 @@ class ArcFlow:
             # remain intact when collections are rebuilt independently.
             # Standard query parser: '*:* AND NOT is_creator:true' matches all
             # documents except those flagged as creators.
+            # The deletion is committed along with the rebuilt records, so
+            # ArcLight keeps serving the previous records in the meantime.
+            # In run_all, commits are held until both workflows finish, since
+            # a commit from the creators workflow would also commit this.
             try:
-                response = requests.post(
-                    f'{self.solr_url}/update?commit=true',
+                response = self.solr_session.post(
+                    f'{self.solr_url}/update?commit=false',
                     json={'delete': {'query': '*:* AND NOT is_creator:true'}},
                 )
                 if response.status_code == 200:
+                    self.solr_commit_pending = True
                     self.log.info('Deleted all collection records from ArcLight Solr.')
                     for dir_path, dir_name in [(resource_dir, 'XMLs'), (pdf_dir, 'PDFs')]:
                         try:
                             shutil.rmtree(dir_path)
+                            with self.dir_entries_lock:
+                                self.dir_entries.pop(os.path.normpath(dir_path), None)
                             self.log.info(f'Deleted {dir_name} directory {dir_path}.')
                         except Exception as e:
                             self.log.error(f'Error deleting {dir_name} directory "{dir_path}": {e}')
@@ -1364,6 +1936,8 @@ class ArcFlow:
         os.makedirs(resource_dir, exist_ok=True)
         os.makedirs(pdf_dir, exist_ok=True)
         self.process_collections(num_processes, modified_since)
+        if self.solr_commit_pending:
+            self.commit_arclight_solr()
 
 
     def run_creators(self, modified_since, num_processes):
@@ -1378,12 +1952,14 @@ class ArcFlow:
             modified_since = 0
 
             # Delete only creator records from Solr (collections are handled separately).
+            # The deletion is committed along with the rebuilt records.
             try:
-                response = requests.post(
-                    f'{self.solr_url}/update?commit=true',
+                response = self.solr_session.post(
+                    f'{self.solr_url}/update?commit=false',
                     json={'delete': {'query': 'is_creator:true'}},
                 )
                 if response.status_code == 200:
+                    self.solr_commit_pending = True
                     self.log.info('Deleted all creator records from ArcLight Solr.')
                     try:
                         shutil.rmtree(agents_dir)
@@ -1397,6 +1973,8 @@ class ArcFlow:
 
         os.makedirs(agents_dir, exist_ok=True)
         self.process_creators(num_processes, modified_since)
+        if self.solr_commit_pending:
+            self.commit_arclight_solr()
 
 
     def run_all(self, modified_since_scope):
@@ -1415,18 +1993,25 @@ class ArcFlow:
 
         # Make sure that the combined sum of num_processes across all parallel 
         # workflows does not exceed max_processes:
-        # 3 processes for collections and 1 for creators is an empirically derived
+        # 3 processes for collections for each 1 for creators is an empirically derived
         # ratio based on typical processing times, amount of memory and CPU power of the server.
         # Adjust as needed based on your environment and data.
-        # but this can be adjusted as needed.
+        # Each workflow gets at least 1 process.
+        collections_processes = max(1, round(self.max_processes * 3 / 4))
+        creators_processes = max(1, self.max_processes - collections_processes)
         workflows = [
-            (self.run_collections, modified_since_scope['collections'], 3),
-            (self.run_creators, modified_since_scope['creators'], 1)
+            (self.run_collections, modified_since_scope['collections'], collections_processes),
+            (self.run_creators, modified_since_scope['creators'], creators_processes)
         ]
+        # Solr commits are global, so hold them until both workflows finish;
+        # otherwise the first commit would expose the other workflow's
+        # teardown before its records are rebuilt.
+        self.solr_commits_held = True
         with concurrent.futures.ThreadPoolExecutor(max_workers=len(workflows)) as executor:
             self.log.info('Running collections and creators in parallel...')
             futures = [executor.submit(workflow, modified_since, num_processes) for workflow, modified_since, num_processes in workflows]
             concurrent.futures.wait(futures)
+            self.solr_commits_held = False
             exceptions = []
             for future in futures:
                 exc = future.exception()
@@ -1436,7 +2021,12 @@ class ArcFlow:
             if exceptions:
                 # Raise the first exception to signal overall failure and prevent
                 # downstream deleted-record processing and config timestamp updates.
+                # Held changes are left uncommitted so ArcLight keeps serving
+                # the previous records.
                 raise exceptions[0]
+        if self.solr_commit_pending:
+            self.commit_arclight_solr()
+
     def run(self):
         """
         Run the ArcFlow process.
@@ -1528,7 +2118,7 @@ def main():
     parser.add_argument(
         '--skip-timestamp-update',
         action='store_true',
-        help='Skip updating last updated timestamps in .arcflow.yml (useful for testing)',)
+        help='Skip updating last updated timestamps in .arcflow.json (useful for testing)',)
     parser.add_argument(
         '--skip-resource-processing',
         action='store_true',
@@ -1543,11 +2133,18 @@ def main():
         '--dry-run-aspace',
         action='store_true',
         help='Run the process without making any changes or triggering any jobs in ArchivesSpace (for testing purposes)',)        
+    parser.add_argument(
+        '--max-processes',
+        type=int,
+        default=4,
+        help='Maximum number of concurrent ArchivesSpace requests (default: 4)',)
     args = parser.parse_args()
 
     # Validate mutually exclusive flags
     if sum([args.agents_only, args.collections_only, args.digital_objects_only]) > 1:
         parser.error('Cannot use more than one of --agents-only, --collections-only, or --digital-objects-only')
+    if args.max_processes < 1:
+        parser.error('--max-processes must be at least 1')
 
     arcflow = ArcFlow(
         arclight_dir=args.arclight_dir,
@@ -1565,7 +2162,8 @@ def main():
         skip_timestamp_update=args.skip_timestamp_update,
         skip_resource_processing=args.skip_resource_processing,
         skip_collection_indexing=args.skip_collection_indexing,
-        dry_run_aspace=args.dry_run_aspace,)
+        dry_run_aspace=args.dry_run_aspace,
+        max_processes=args.max_processes,)
     arcflow.run()
 
 
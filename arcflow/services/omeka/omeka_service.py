@@ -4,8 +4,10 @@ import yaml
 import mssql_python
 import uuid
 import requests
+from requests.adapters import HTTPAdapter
 from io import BytesIO, BufferedReader
 from utils.stage_classifications import labels_from_path
+from utils.yaml_loader import SafeLoader
 
 
 class OmekaService:
@@ -44,6 +46,12 @@ class OmekaService:
             'key_identity': kwargs['omeka']['key_identity'],
             'key_credential': kwargs['omeka']['key_credential'],
         }
+        # keep-alive session shared by all Omeka API requests,
+        # with a connection for each worker thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=64)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.use_archon = kwargs.get('use_archon', 0)
         if self.use_archon:
             self.archon = kwargs.get('archon', {})
@@ -56,7 +64,7 @@ class OmekaService:
 
         try:
             with open(os.path.join(os.path.abspath((__file__) + "/../"), 'enumerations.yml'), 'r') as file:
-                self.enumerations  = yaml.safe_load(file)
+                self.enumerations  = yaml.load(file, Loader=SafeLoader)
         except FileNotFoundError:
             self.log.error('File enumerations.yml not found.')
             exit(0)
@@ -92,12 +100,11 @@ class OmekaService:
 
 
     def get(self, endpoint, params=None):
-        with requests.Session() as session:
-            response = session.get(
-                f'{self.omeka_local_url}/{endpoint}', 
-                params={**self.params, **(params or {})})
-            response.raise_for_status()
-            return response.json()
+        response = self.session.get(
+            f'{self.omeka_local_url}/{endpoint}', 
+            params={**self.params, **(params or {})})
+        response.raise_for_status()
+        return response.json()
 
 
     def _is_public(self, obj):
@@ -461,9 +468,8 @@ class OmekaService:
             None,
             json.dumps(item_data),
             'application/json')))
-        with requests.Session() as session:
-            response = session.post(f'{self.omeka_local_url}/api/items', 
-                params=self.params, files=form_data)
+        response = self.session.post(f'{self.omeka_local_url}/api/items', 
+            params=self.params, files=form_data)
 
         try:
             file_unavailable.close()
@@ -523,111 +529,110 @@ class OmekaService:
         media_list = {media['o:source']: media['o:id'] for media in media_sources}
         primary_media = None
 
-        with requests.Session() as session:
-            has_children = False
-            if ('tree' in digital_object and
-                    '_resolved' in digital_object['tree']):
-                for child in digital_object['tree']['_resolved']['children']:
-                    # resolved does not include label, so we need to get the 
-                    # digital object component record for each child to get those values
-                    digital_object_component = self.asnake_client.get(
-                        child['record_uri']
-                    ).json()
-                    title = digital_object_component.get('title', '')
-                    label = digital_object_component.get('label', '')
-                    is_public = self._is_public(digital_object_component)
-                    for file_version in child['file_versions']:
-                        if ('file_format_version' in file_version):
-                            file_name = f'{file_version["file_format_version"]}_{file_version["file_uri"]}'
-                            file_path = f'{self.tmp_dir}{file_name}'
-                            caption = file_version.get('caption', '')
-
-                            # if already exists in Omeka, just update the metadata
-                            if (file_name in media_list):
-                                preview_type = ' (Long Preview)' if '_long_preview' in file_version["file_uri"] else ' (No Preview)' if '_no_preview' in file_version["file_uri"] else ''
-                                media_data = self._prepare_media_data(
-                                    is_public=self._is_public(file_version) if is_public else False,
-                                    title=f'{title}{preview_type}',
-                                    label=label,
-                                    caption=caption,
-                                    item_type='o:Media')
-                                if file_version['is_representative']:
-                                    primary_media = media_list[file_name]
-                                response = session.patch(
-                                    f'{self.omeka_local_url}/api/media/{media_list[file_name]}',
-                                    params=self.params, json=media_data)
-                                response.raise_for_status()
-
-                                media_list.pop(file_name)
-
-                            # if not, create a new media
-                            elif (os.path.isfile(file_path)):
-                                media_data = self._prepare_media_data(
-                                    file_index=0,
-                                    item_id=item[0]['o:id'],
-                                    is_public=self._is_public(file_version) if is_public else False,
-                                    title=title,
-                                    label=label,
-                                    caption=caption)
-                                form_data = [
-                                    (f'file[0]', (file_name, open(file_path, 'rb'))),
-                                    ('data', (None, json.dumps(media_data), 'application/json')),
-                                ]
-
-                                response = session.post(
-                                    f'{self.omeka_local_url}/api/media', params=self.params, files=form_data)
-                                response.raise_for_status()
-
-                                if file_version['is_representative']:
-                                    primary_media = response.json()['o:id']
-
-                            if not has_children:
-                                has_children = True
-
-            # delete media not present in the digital object anymore
-            if has_children:
-                if soft_delete:
-                    for media in media_list.values():
-                        response = session.patch(
-                            f'{self.omeka_local_url}/api/media/{media}',
-                            params=self.params, json={
-                                'o:is_public': False,
-                            })
-                        response.raise_for_status()
-                # uncomment the following lines for hard delete in Omeka
-                # (delete media files permanently, so use with caution)
-                else:
-                    for media in media_list.values():
-                        response = session.delete(
-                            f'{self.omeka_local_url}/api/media/{media}',
-                            params=self.params)
-                        response.raise_for_status()
-
-            # update the item metadata
-            item_data = self._prepare_item_data(digital_object)
-            if primary_media:
-                item_data['o:primary_media'] = {
-                    'o:id': primary_media
-                }
-
-            if not has_children:
-                omeka_uri = f'{self.omeka_public_url}/item/{item[0]["o:id"]}/uv'
-                for file_version in digital_object['file_versions']:
-                    if file_version['file_uri'] != omeka_uri:
-                        item_data['schema:url'] = item_data.get('schema:url', [])
-                        item_data['schema:url'].append({
-                            'property_id': 'auto',
-                            '@id': file_version['file_uri'],
-                            'type': 'uri',
-                            'is_public': self._is_public(file_version),
+        has_children = False
+        if ('tree' in digital_object and
+                '_resolved' in digital_object['tree']):
+            for child in digital_object['tree']['_resolved']['children']:
+                # resolved does not include label, so we need to get the 
+                # digital object component record for each child to get those values
+                digital_object_component = self.asnake_client.get(
+                    child['record_uri']
+                ).json()
+                title = digital_object_component.get('title', '')
+                label = digital_object_component.get('label', '')
+                is_public = self._is_public(digital_object_component)
+                for file_version in child['file_versions']:
+                    if ('file_format_version' in file_version):
+                        file_name = f'{file_version["file_format_version"]}_{file_version["file_uri"]}'
+                        file_path = f'{self.tmp_dir}{file_name}'
+                        caption = file_version.get('caption', '')
+
+                        # if already exists in Omeka, just update the metadata
+                        if (file_name in media_list):
+                            preview_type = ' (Long Preview)' if '_long_preview' in file_version["file_uri"] else ' (No Preview)' if '_no_preview' in file_version["file_uri"] else ''
+                            media_data = self._prepare_media_data(
+                                is_public=self._is_public(file_version) if is_public else False,
+                                title=f'{title}{preview_type}',
+                                label=label,
+                                caption=caption,
+                                item_type='o:Media')
+                            if file_version['is_representative']:
+                                primary_media = media_list[file_name]
+                            response = self.session.patch(
+                                f'{self.omeka_local_url}/api/media/{media_list[file_name]}',
+                                params=self.params, json=media_data)
+                            response.raise_for_status()
+
+                            media_list.pop(file_name)
+
+                        # if not, create a new media
+                        elif (os.path.isfile(file_path)):
+                            media_data = self._prepare_media_data(
+                                file_index=0,
+                                item_id=item[0]['o:id'],
+                                is_public=self._is_public(file_version) if is_public else False,
+                                title=title,
+                                label=label,
+                                caption=caption)
+                            form_data = [
+                                (f'file[0]', (file_name, open(file_path, 'rb'))),
+                                ('data', (None, json.dumps(media_data), 'application/json')),
+                            ]
+
+                            response = self.session.post(
+                                f'{self.omeka_local_url}/api/media', params=self.params, files=form_data)
+                            response.raise_for_status()
+
+                            if file_version['is_representative']:
+                                primary_media = response.json()['o:id']
+
+                        if not has_children:
+                            has_children = True
+
+        # delete media not present in the digital object anymore
+        if has_children:
+            if soft_delete:
+                for media in media_list.values():
+                    response = self.session.patch(
+                        f'{self.omeka_local_url}/api/media/{media}',
+                        params=self.params, json={
+                            'o:is_public': False,
                         })
-                        break
+                    response.raise_for_status()
+            # uncomment the following lines for hard delete in Omeka
+            # (delete media files permanently, so use with caution)
+            else:
+                for media in media_list.values():
+                    response = self.session.delete(
+                        f'{self.omeka_local_url}/api/media/{media}',
+                        params=self.params)
+                    response.raise_for_status()
 
-            response = session.patch(
-                f'{self.omeka_local_url}/api/items/{item[0]["o:id"]}',
-                params=self.params, json=item_data)
-            response.raise_for_status()
-            return self._update_omeka_uri(digital_object, response.json()['o:id'])
+        # update the item metadata
+        item_data = self._prepare_item_data(digital_object)
+        if primary_media:
+            item_data['o:primary_media'] = {
+                'o:id': primary_media
+            }
+
+        if not has_children:
+            omeka_uri = f'{self.omeka_public_url}/item/{item[0]["o:id"]}/uv'
+            for file_version in digital_object['file_versions']:
+                if file_version['file_uri'] != omeka_uri:
+                    item_data['schema:url'] = item_data.get('schema:url', [])
+                    item_data['schema:url'].append({
+                        'property_id': 'auto',
+                        '@id': file_version['file_uri'],
+                        'type': 'uri',
+                        'is_public': self._is_public(file_version),
+                    })
+                    break
+
+        response = self.session.patch(
+            f'{self.omeka_local_url}/api/items/{item[0]["o:id"]}',
+            params=self.params, json=item_data)
+        response.raise_for_status()
+        return self._update_omeka_uri(digital_object, response.json()['o:id'])
 
 
     def delete(self, digital_object_uri, soft_delete=False):
@@ -635,59 +640,57 @@ class OmekaService:
         if not item:
             return None
 
-        with requests.Session() as session:
-            if soft_delete:
-                response = session.patch(
-                    f'{self.omeka_local_url}/api/items/{item[0]["o:id"]}',
-                    params=self.params, json={
-                        'o:is_public': False,
-                    })
-                response.raise_for_status()
-                return response.status_code == 200
-            # uncomment the following lines for hard delete in Omeka 
-            # (deletes the item and all its media files permanently, so use with caution)
-            else:
-                response = session.delete(
-                    f'{self.omeka_local_url}/api/items/{item[0]["o:id"]}',
-                    params=self.params)
-                response.raise_for_status()
-                return response.status_code == 204
+        if soft_delete:
+            response = self.session.patch(
+                f'{self.omeka_local_url}/api/items/{item[0]["o:id"]}',
+                params=self.params, json={
+                    'o:is_public': False,
+                })
+            response.raise_for_status()
+            return response.status_code == 200
+        # uncomment the following lines for hard delete in Omeka 
+        # (deletes the item and all its media files permanently, so use with caution)
+        else:
+            response = self.session.delete(
+                f'{self.omeka_local_url}/api/items/{item[0]["o:id"]}',
+                params=self.params)
+            response.raise_for_status()
+            return response.status_code == 204
 
 
     def delete_all(self, soft_delete=False):
-        with requests.Session() as session:
-            if soft_delete:
-                page = 1
-                while True:
-                    items = self.get('api/items',
-                        params={
-                            'page': page,
+        if soft_delete:
+            page = 1
+            while True:
+                items = self.get('api/items',
+                    params={
+                        'page': page,
+                    })
+                if not items:
+                    break
+
+                for item in items:
+                    response = self.session.patch(
+                        f'{self.omeka_local_url}/api/items/{item["o:id"]}',
+                        params=self.params, json={
+                            'o:is_public': False,
                         })
-                    if not items:
-                        break
-
-                    for item in items:
-                        response = session.patch(
-                            f'{self.omeka_local_url}/api/items/{item["o:id"]}',
-                            params=self.params, json={
-                                'o:is_public': False,
-                            })
-                        response.raise_for_status()
-                    self.log.info(f'Soft deleted batch of {len(items)} items found.')
+                    response.raise_for_status()
+                self.log.info(f'Soft deleted batch of {len(items)} items found.')
 
-                    page += 1
-            # uncomment the following lines for hard delete in Omeka 
-            # (deletes all items and their media files permanently, so use with caution)
-            else:
-                while True:
-                    items = self.get('api/items')
-                    if not items:
-                        break
-
-                    for item in items:
-                        response = session.delete(
-                            f'{self.omeka_local_url}/api/items/{item["o:id"]}',
-                            params=self.params)
-                        response.raise_for_status()
-                    self.log.info(f'Deleted batch of {len(items)} items found.')
+                page += 1
+        # uncomment the following lines for hard delete in Omeka 
+        # (deletes all items and their media files permanently, so use with caution)
+        else:
+            while True:
+                items = self.get('api/items')
+                if not items:
+                    break
+
+                for item in items:
+                    response = self.session.delete(
+                        f'{self.omeka_local_url}/api/items/{item["o:id"]}',
+                        params=self.params)
+                    response.raise_for_status()
+                self.log.info(f'Deleted batch of {len(items)} items found.')
 
@@ -9,7 +9,7 @@ Handles EAD and EAC-CPF XML transformations including:
 """
 
 import re
-from typing import Optional, List
+from typing import Optional, List, Union
 from lxml import etree
 import logging
 
@@ -28,7 +28,33 @@ class XmlTransformService:
         self.client = client
         self.log = log or logging.getLogger(__name__)
 
-    def add_creator_ids_to_ead(self, ead: str, resource: dict) -> str:
+    @staticmethod
+    def _parse_ead(ead: Union[str, bytes]):
+        """
+        Parse EAD XML with lxml, accepting the raw response bytes as-is so
+        callers don't need to decode (and later re-encode) the document.
+        """
+        if isinstance(ead, str):
+            ead = ead.encode('utf-8')
+        parser = etree.XMLParser(remove_blank_text=False)
+        return etree.fromstring(ead, parser)
+
+    @staticmethod
+    def _serialize_ead(root, ead: Union[str, bytes]) -> Union[str, bytes]:
+        """
+        Serialize root with its XML declaration, returning the same type
+        (str or bytes) that the EAD was passed in as.
+        """
+        result = etree.tostring(
+            root,
+            encoding='UTF-8',
+            method='xml',
+            pretty_print=False,
+            xml_declaration=True
+        )
+        return result.decode('utf-8') if isinstance(ead, str) else result
+
+    def add_creator_ids_to_ead(self, ead: Union[str, bytes], resource: dict) -> Union[str, bytes]:
         """
         Add arcuit:creator_id attributes to name elements inside <origination> elements in EAD XML.
 
@@ -39,84 +65,20 @@ class XmlTransformService:
         The arcuit:creator_id value is a creator ID in the format creator_{type}_{id}.
 
         Args:
-            ead: EAD XML as a string
+            ead: EAD XML as a string or UTF-8 encoded bytes
             resource: ArchivesSpace resource record with resolved linked_agents
 
         Returns:
-            str: Modified EAD XML string with arcuit namespace and creator_id attributes
+            Modified EAD XML with arcuit namespace and creator_id attributes,
+            of the same type (str or bytes) as ead
         """
-
-        # Extract creator IDs from linked_agents in order
-        creator_ids = []
-        for linked_agent in resource.get('linked_agents', []):
-            if linked_agent.get('role') == 'creator':
-                agent_ref = linked_agent.get('ref', '')
-                match = re.match(r'.*/agents/(corporate_entities|people|families)/(\d+)$', agent_ref)
-                if match:
-                    creator_ids.append(f'creator_{match.group(1)}_{match.group(2)}')
-                else:
-                    self.log.warning(f'Could not parse creator ID from agent ref: {agent_ref}')
-
+        creator_ids = self._get_creator_ids(resource)
         if not creator_ids:
             return ead
 
         try:
-            # Define the Arcuit namespace
-            arcuit_ns = "https://arcuit.library.illinois.edu/ead-extensions"
-
-            # Parse the XML with lxml
-            parser = etree.XMLParser(remove_blank_text=False)
-            root = etree.fromstring(ead.encode('utf-8'), parser)
-            namespace = ''
-            if root.tag.startswith('{'):
-                namespace = root.tag.split('}')[0] + '}'
-
-            # Add arcuit namespace declaration to root element if not present
-            nsmap = root.nsmap.copy() if root.nsmap else {}
-            if 'arcuit' not in nsmap:
-                nsmap['arcuit'] = arcuit_ns
-                # Create a new root element with updated namespace map
-                new_root = etree.Element(root.tag, nsmap=nsmap, attrib=root.attrib)
-                new_root.text = root.text
-                new_root.tail = root.tail
-                for child in root:
-                    new_root.append(child)
-                root = new_root
-
-            # Find all origination elements with label="Creator"
-            creator_idx = 0
-            for origination in root.iter(f'{namespace}origination'):
-                if origination.get('label') == 'Creator' and creator_idx < len(creator_ids):
-                    creator_id = creator_ids[creator_idx]
-
-                    # Find the first name element (corpname, persname, or famname)
-                    name_elem = None
-                    for tag in ['corpname', 'persname', 'famname']:
-                        name_elem = origination.find(f'{namespace}{tag}')
-                        if name_elem is not None:
-                            break
-
-                    if name_elem is not None:
-                        # Add the arcuit:creator_id attribute (always, never skip)
-                        name_elem.set(f'{{{arcuit_ns}}}creator_id', creator_id)
-                        creator_idx += 1
-                    else:
-                        # No eligible name element found
-                        self.log.debug(
-                            f'No eligible name element in <origination> for creator ID {creator_id}'
-                        )
-
-            # Convert back to string with lxml, preserving XML declaration and namespaces
-            # Serialize to bytes first (which allows xml_declaration), then decode
-            result_bytes = etree.tostring(
-                root, 
-                encoding='UTF-8', 
-                method='xml',
-                pretty_print=False,
-                xml_declaration=True
-            )
-            result = result_bytes.decode('utf-8')
-            return result
+            root = self._add_creator_ids(self._parse_ead(ead), creator_ids)
+            return self._serialize_ead(root, ead)
 
         except etree.ParseError as e:
             self.log.error(f'Failed to parse EAD XML: {e}. Returning original content.')
@@ -124,11 +86,11 @@ class XmlTransformService:
 
     def inject_collection_metadata(
         self,
-        ead: str,
+        ead: Union[str, bytes],
         record_group: Optional[str],
         subgroup: Optional[str],
         bioghist_content: Optional[str]
-    ) -> str:
+    ) -> Union[str, bytes]:
         """
         Inject ArcFlow metadata into collection EAD XML after </did> tag.
 
@@ -137,104 +99,221 @@ class XmlTransformService:
         - Biographical/historical notes from creator agents
 
         Args:
-            ead: EAD XML as a string
+            ead: EAD XML as a string or UTF-8 encoded bytes
             record_group: Record group label (e.g., "ALA 52 — Library Periodicals")
             subgroup: Subgroup label (e.g., "ALA 52.2 — Publications")
             bioghist_content: XML string of bioghist elements to inject
 
         Returns:
-            str: Modified EAD XML string
+            Modified EAD XML, of the same type (str or bytes) as ead
         """
-        try:
-            # Parse the XML with lxml
-            parser = etree.XMLParser(remove_blank_text=False)
-            root = etree.fromstring(ead.encode('utf-8'), parser)
+        if not (record_group or bioghist_content):
+            return ead
 
-            # Get the namespace, if any
-            namespace = ''
-            if root.tag.startswith('{'):
-                namespace = root.tag.split('}')[0] + '}'
-            
-            archdesc = None
-            for elem in root.iter(f'{namespace}archdesc'):
-                if elem.get('level') == 'collection':
-                    archdesc = elem
-                    break
-            
-            if archdesc is None:
+        try:
+            root = self._parse_ead(ead)
+            if not self._inject_collection_metadata(root, record_group, subgroup, bioghist_content):
                 return ead
-            
-            did = archdesc.find(f'{namespace}did')
-            if did is None:
+            return self._serialize_ead(root, ead)
+
+        except etree.ParseError as e:
+            self.log.error(f'Failed to parse EAD XML: {e}. Returning original content.')
+            return ead
+
+    def transform_collection_ead(
+        self,
+        ead: Union[str, bytes],
+        resource: dict,
+        record_group: Optional[str],
+        subgroup: Optional[str],
+        bioghist_content: Optional[str]
+    ) -> Union[str, bytes]:
+        """
+        Apply add_creator_ids_to_ead and inject_collection_metadata to EAD XML
+        with a single parse and serialization of the document.
+
+        Args:
+            ead: EAD XML as a string or UTF-8 encoded bytes
+            resource: ArchivesSpace resource record with resolved linked_agents
+            record_group: Record group label (e.g., "ALA 52 — Library Periodicals")
+            subgroup: Subgroup label (e.g., "ALA 52.2 — Publications")
+            bioghist_content: XML string of bioghist elements to inject
+
+        Returns:
+            Modified EAD XML, of the same type (str or bytes) as ead
+        """
+        creator_ids = self._get_creator_ids(resource)
+        if not (creator_ids or record_group or bioghist_content):
+            return ead
+
+        try:
+            root = self._parse_ead(ead)
+            if creator_ids:
+                root = self._add_creator_ids(root, creator_ids)
+            injected = bool(record_group or bioghist_content) and self._inject_collection_metadata(
+                root, record_group, subgroup, bioghist_content)
+            if not (creator_ids or injected):
                 return ead
+            return self._serialize_ead(root, ead)
+
+        except etree.ParseError as e:
+            self.log.error(f'Failed to parse EAD XML: {e}. Returning original content.')
+            return ead
+
+    def _get_creator_ids(self, resource: dict) -> List[str]:
+        """
+        Get the creator IDs (creator_{type}_{id}) of the linked_agents with
+        role='creator' of a resource, in order.
+        """
+        creator_ids = []
+        for linked_agent in resource.get('linked_agents', []):
+            if linked_agent.get('role') == 'creator':
+                agent_ref = linked_agent.get('ref', '')
+                match = re.match(r'.*/agents/(corporate_entities|people|families)/(\d+)$', agent_ref)
+                if match:
+                    creator_ids.append(f'creator_{match.group(1)}_{match.group(2)}')
+                else:
+                    self.log.warning(f'Could not parse creator ID from agent ref: {agent_ref}')
+        return creator_ids
+
+    def _add_creator_ids(self, root, creator_ids: List[str]):
+        """
+        Add arcuit:creator_id attributes to the parsed EAD root element.
+
+        Returns:
+            The root element, which is replaced by a copy when the arcuit
+            namespace has to be declared on it
+        """
+        # Define the Arcuit namespace
+        arcuit_ns = "https://arcuit.library.illinois.edu/ead-extensions"
+
+        namespace = ''
+        if root.tag.startswith('{'):
+            namespace = root.tag.split('}')[0] + '}'
+
+        # Add arcuit namespace declaration to root element if not present
+        nsmap = root.nsmap.copy() if root.nsmap else {}
+        if 'arcuit' not in nsmap:
+            nsmap['arcuit'] = arcuit_ns
+            # Create a new root element with updated namespace map
+            new_root = etree.Element(root.tag, nsmap=nsmap, attrib=root.attrib)
+            new_root.text = root.text
+            new_root.tail = root.tail
+            for child in root:
+                new_root.append(child)
+            root = new_root
+
+        # Find all origination elements with label="Creator"
+        creator_idx = 0
+        for origination in root.iter(f'{namespace}origination'):
+            if origination.get('label') == 'Creator' and creator_idx < len(creator_ids):
+                creator_id = creator_ids[creator_idx]
+
+                # Find the first name element (corpname, persname, or famname)
+                name_elem = None
+                for tag in ['corpname', 'persname', 'famname']:
+                    name_elem = origination.find(f'{namespace}{tag}')
+                    if name_elem is not None:
+                        break
+
+                if name_elem is not None:
+                    # Add the arcuit:creator_id attribute (always, never skip)
+                    name_elem.set(f'{{{arcuit_ns}}}creator_id', creator_id)
+                    creator_idx += 1
+                else:
+                    # No eligible name element found
+                    self.log.debug(
+                        f'No eligible name element in <origination> for creator ID {creator_id}'
+                    )
+
+        return root
+
+    def _inject_collection_metadata(
+        self,
+        root,
+        record_group: Optional[str],
+        subgroup: Optional[str],
+        bioghist_content: Optional[str]
+    ) -> bool:
+        """
+        Inject ArcFlow metadata into the parsed EAD root element after </did>.
+
+        Returns:
+            bool: False if the EAD has no collection-level <archdesc>/<did>
+        """
+        # Get the namespace, if any
+        namespace = ''
+        if root.tag.startswith('{'):
+            namespace = root.tag.split('}')[0] + '}'
+        
+        archdesc = None
+        for elem in root.iter(f'{namespace}archdesc'):
+            if elem.get('level') == 'collection':
+                archdesc = elem
+                break
+        
+        if archdesc is None:
+            return False
+        
+        did = archdesc.find(f'{namespace}did')
+        if did is None:
+            return False
+        
+        did_index = list(archdesc).index(did)
+        insert_index = did_index + 1
+        
+        if record_group:
+            recordgroup = etree.Element(f'{namespace}recordgroup')
+            recordgroup.text = record_group
+            archdesc.insert(insert_index, recordgroup)
+            insert_index += 1
             
-            did_index = list(archdesc).index(did)
-            insert_index = did_index + 1
-            
-            if record_group:
-                recordgroup = etree.Element(f'{namespace}recordgroup')
-                recordgroup.text = record_group
-                archdesc.insert(insert_index, recordgroup)
+            if subgroup:
+                subgroup_elem = etree.Element(f'{namespace}subgroup')
+                subgroup_elem.text = subgroup
+                archdesc.insert(insert_index, subgroup_elem)
                 insert_index += 1
-                
-                if subgroup:
-                    subgroup_elem = etree.Element(f'{namespace}subgroup')
-                    subgroup_elem.text = subgroup
-                    archdesc.insert(insert_index, subgroup_elem)
-                    insert_index += 1
+        
+        if bioghist_content:
+            existing_bioghist = None
+            for elem in archdesc:
+                if elem.tag == f'{namespace}bioghist':
+                    existing_bioghist = elem
+                    break
             
-            if bioghist_content:
-                existing_bioghist = None
-                for elem in archdesc:
-                    if elem.tag == f'{namespace}bioghist':
-                        existing_bioghist = elem
-                        break
+            try:
+                # Wrap in a temporary root to handle multiple bioghist elements
+                bioghist_wrapper = etree.fromstring(f'<wrapper>{bioghist_content}</wrapper>'.encode('utf-8'))
+                bioghist_elements = list(bioghist_wrapper)
+
+                def _qualify_namespace(elem):
+                    """
+                    Ensure elem and its descendants use the same namespace as the
+                    source EAD document when a default namespace is present.
+                    """
+                    if not namespace:
+                        return
+                    for child in elem.iter():
+                        if isinstance(child.tag, str) and not child.tag.startswith('{'):
+                            child.tag = f'{namespace}{child.tag}'
                 
-                try:
-                    # Wrap in a temporary root to handle multiple bioghist elements
-                    bioghist_wrapper = etree.fromstring(f'<wrapper>{bioghist_content}</wrapper>'.encode('utf-8'))
-                    bioghist_elements = list(bioghist_wrapper)
-
-                    def _qualify_namespace(elem):
-                        """
-                        Ensure elem and its descendants use the same namespace as the
-                        source EAD document when a default namespace is present.
-                        """
-                        if not namespace:
-                            return
-                        for child in elem.iter():
-                            if isinstance(child.tag, str) and not child.tag.startswith('{'):
-                                child.tag = f'{namespace}{child.tag}'
+                if existing_bioghist is not None:
+                    for bioghist_elem in bioghist_elements:
+                        _qualify_namespace(bioghist_elem)
+                        existing_bioghist.append(bioghist_elem)
+                else:
+                    # No existing bioghist: insert each parsed bioghist element
+                    # directly into archdesc to preserve creator-level wrappers
+                    # and attributes (e.g., id) returned by get_creator_bioghist.
+                    for bioghist_elem in bioghist_elements:
+                        _qualify_namespace(bioghist_elem)
+                        archdesc.insert(insert_index, bioghist_elem)
+                        insert_index += 1
                     
-                    if existing_bioghist is not None:
-                        for bioghist_elem in bioghist_elements:
-                            _qualify_namespace(bioghist_elem)
-                            existing_bioghist.append(bioghist_elem)
-                    else:
-                        # No existing bioghist: insert each parsed bioghist element
-                        # directly into archdesc to preserve creator-level wrappers
-                        # and attributes (e.g., id) returned by get_creator_bioghist.
-                        for bioghist_elem in bioghist_elements:
-                            _qualify_namespace(bioghist_elem)
-                            archdesc.insert(insert_index, bioghist_elem)
-                            insert_index += 1
-                        
-                except etree.ParseError as e:
-                    self.log.warning(f'Failed to parse bioghist content: {e}')
-            
-            result_bytes = etree.tostring(
-                root,
-                encoding='UTF-8',
-                method='xml',
-                pretty_print=False,
-                xml_declaration=True
-            )
-            result = result_bytes.decode('utf-8')
-            return result
-            
-        except etree.ParseError as e:
-            self.log.error(f'Failed to parse EAD XML: {e}. Returning original content.')
-            return ead
+            except etree.ParseError as e:
+                self.log.warning(f'Failed to parse bioghist content: {e}')
+
+        return True
 
     def add_collection_links_to_eac_cpf(self, eac_cpf_xml: str) -> str:
         """
@@ -8,13 +8,14 @@ import time
 from pathlib import Path
 from datetime import datetime
 from asnake.client import ASnakeClient
+from utils.yaml_loader import SafeLoader
 
 
 def __get_asnake_client():
     """Function to create and return an ASnakeClient instance."""
     try:
         with open('.archivessnake.yml', 'r') as file:
-            config = yaml.safe_load(file)
+            config = yaml.load(file, Loader=SafeLoader)
     except FileNotFoundError:
         print('File .archivessnake.yml not found. Create the file.')
         exit(0)
@@ -10,6 +10,7 @@ import json
 import yaml
 import argparse
 from asnake.client import ASnakeClient
+from utils.yaml_loader import SafeLoader
 
 
 def get_asnake_client():
@@ -25,7 +26,7 @@ def get_asnake_client():
     """
     try:
         with open('.archivessnake.yml', 'r') as file:
-            config = yaml.safe_load(file)
+            config = yaml.load(file, Loader=SafeLoader)
     except FileNotFoundError:
         print('Error: .archivessnake.yml not found.')
         exit(1)
@@ -88,33 +89,54 @@ def parse_eadid(eadid):
     return repo_code, rg_id, sg_id, col_id
 
 
-def extract_labels(resource):
-    """Extracts classification labels and metadata from a resource record.
+def extract_rg_sg_labels(resource):
+    """Extracts the record group and subgroup labels from a resource record.
+
+    Classifications are scanned from the last one, as later classifications
+    take precedence, stopping once both labels are found.
 
     Args:
         resource (dict): A resource record from ArchivesSpace.
 
     Returns:
-        tuple[str | None, str | None, str | None, str | None]: eadid, record_group_label, subgroup_label, title
+        tuple[str | None, str | None]: record_group_label, subgroup_label
     """
-    eadid = resource.get('ead_id', '').strip()
-    title = resource.get('title', '').strip()
-    if not eadid:
-        return None, None, None, None
+    if not resource.get('ead_id', '').strip():
+        return None, None
 
     record_group_label = subgroup_label = None
-    for link in resource.get('classifications', []):
+    for link in reversed(resource.get('classifications', [])):
         term = link.get('_resolved', {})
         path = term.get('path_from_root', [])
         rg, sg = labels_from_path(path)
-        if rg:
+        if rg and not record_group_label:
             record_group_label = rg
-        if sg:
+        if sg and not subgroup_label:
             subgroup_label = sg
+        if record_group_label and subgroup_label:
+            break
+
+    if not record_group_label:
+        return None, None
+
+    return record_group_label, subgroup_label
+
 
+def extract_labels(resource):
+    """Extracts classification labels and metadata from a resource record.
+
+    Args:
+        resource (dict): A resource record from ArchivesSpace.
+
+    Returns:
+        tuple[str | None, str | None, str | None, str | None]: eadid, record_group_label, subgroup_label, title
+    """
+    record_group_label, subgroup_label = extract_rg_sg_labels(resource)
     if not record_group_label:
         return None, None, None, None
 
+    eadid = resource['ead_id'].strip()
+    title = resource.get('title', '').strip()
     return eadid, record_group_label, subgroup_label, title
 
 
@@ -0,0 +1,10 @@
+"""YAML loader and dumper classes shared by ArcFlow and its utilities.
+
+Uses the LibYAML bindings, much faster than the pure-Python loader and
+dumper, when PyYAML is built with them.
+"""
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
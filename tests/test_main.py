@@ -0,0 +1,970 @@
+"""
+Tests for ArcFlow.
+"""
+
+import concurrent.futures
+import io
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import Mock, patch
+import requests
+from arcflow.main import ArcFlow, atomic_write, load_yaml_file
+
+# the module ArcFlow was loaded from, whatever name it was imported under
+main = sys.modules[ArcFlow.__module__]
+
+
+def make_arcflow(**attrs):
+    """Create an ArcFlow without connecting to ArchivesSpace or Solr."""
+    arcflow = ArcFlow.__new__(ArcFlow)
+    arcflow.log = Mock()
+    arcflow.solr_url = 'http://solr.test/solr/arclight'
+    arcflow.solr_session = Mock()
+    arcflow.solr_commit_pending = False
+    arcflow.solr_commits_held = False
+    arcflow.pending_solr_deletes = []
+    arcflow.solr_deletes_lock = threading.Lock()
+    arcflow.dir_entries = {}
+    arcflow.dir_entries_lock = threading.Lock()
+    arcflow.pdf_job_queue = None
+    for name, value in attrs.items():
+        setattr(arcflow, name, value)
+    return arcflow
+
+
+def json_response(data):
+    """Create an ArchivesSpace response with a JSON body."""
+    return Mock(content=json.dumps(data).encode(), **{'json.return_value': data})
+
+
+def streamed_response(raw):
+    """Create a response whose body is read from raw as it is iterated."""
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = raw
+    return response
+
+
+class FailingStream(io.BytesIO):
+    """A response body whose connection drops after the first chunk."""
+
+    def read(self, size=-1):
+        if self.tell() > 0:
+            raise ConnectionError('connection reset')
+        return super().read(size)
+
+
+class TestRunAll(unittest.TestCase):
+    """Test cases for running the workflows in parallel."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.arcflow = make_arcflow(max_processes=4)
+        self.arcflow.solr_session.get.return_value = Mock(status_code=200)
+        self.arcflow.update_repositories = Mock()
+        self.arcflow.run_digital_objects = Mock()
+        self.scope = {'collections': 0, 'creators': 0, 'digital_objects': 0}
+        self.both_started = threading.Barrier(2, timeout=5)
+
+    def run_workflow(self, modified_since, num_processes):
+        """Stand in for a workflow that tears down Solr and commits."""
+        self.both_started.wait()
+        self.arcflow.solr_commit_pending = True
+        self.arcflow.commit_arclight_solr()
+
+    def test_commits_once_after_both_workflows(self):
+        """Test that neither workflow commits the other's teardown early."""
+        self.arcflow.run_collections = self.run_workflow
+        self.arcflow.run_creators = self.run_workflow
+
+        self.arcflow.run_all(self.scope)
+
+        self.arcflow.solr_session.get.assert_called_once_with(
+            f'{self.arcflow.solr_url}/update?commit=true&openSearcher=true')
+        self.assertFalse(self.arcflow.solr_commits_held)
+        self.assertFalse(self.arcflow.solr_commit_pending)
+
+    def test_failed_workflow_leaves_changes_uncommitted(self):
+        """Test that a failed workflow does not commit the teardown."""
+        def failing_workflow(modified_since, num_processes):
+            self.both_started.wait()
+            raise RuntimeError('traject failed')
+
+        self.arcflow.run_collections = self.run_workflow
+        self.arcflow.run_creators = failing_workflow
+
+        with self.assertRaises(RuntimeError):
+            self.arcflow.run_all(self.scope)
+
+        self.arcflow.solr_session.get.assert_not_called()
+        self.assertFalse(self.arcflow.solr_commits_held)
+
+    def test_failed_commit_keeps_changes_pending(self):
+        """Test that changes are still pending if Solr rejects the commit."""
+        self.arcflow.solr_session.get.return_value = Mock(status_code=503)
+        self.arcflow.run_collections = self.run_workflow
+        self.arcflow.run_creators = self.run_workflow
+
+        self.arcflow.run_all(self.scope)
+
+        self.arcflow.solr_session.get.assert_called_once()
+        self.assertTrue(self.arcflow.solr_commit_pending)
+
+
+class TestProcessCollections(unittest.TestCase):
+    """Test cases for dispatching resource and indexing tasks."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.arcflow = make_arcflow(
+            arclight_dir=self.tmp_dir.name,
+            repository_id=None,
+            resources_batch_size=2,
+            skip_pdf_generation=True,
+            skip_resource_processing=False,
+            skip_collection_indexing=False)
+        self.repos = {
+            '2': {'uri': '/repositories/2'},
+            '3': {'uri': '/repositories/3'},
+        }
+        self.resource_ids = {'2': list(range(1, 12)), '3': list(range(20, 25))}
+        self.lock = threading.Lock()
+        self.fetched = 0
+        self.processed = {repo_id: [] for repo_id in self.repos}
+        self.max_in_flight = 0
+        self.indexed = []
+
+        self.arcflow.get_repositories = Mock(return_value=list(self.repos.values()))
+        self.arcflow.task_repository = lambda repo, modified_since, record_type: (
+            repo, self.resource_ids[self.arcflow.get_repo_id(repo)])
+        self.arcflow.client = Mock()
+        self.arcflow.client.get.side_effect = self.get_resources
+        self.arcflow.task_resource = self.task_resource
+        self.arcflow.flush_solr_deletes = Mock(return_value=0)
+        self.arcflow.index_collections = self.index_collections
+        self.arcflow.commit_arclight_solr = Mock(return_value=True)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmp_dir.cleanup()
+
+    def get_resources(self, uri, params):
+        """Stand in for the ArchivesSpace resources endpoint."""
+        resource_ids = params['id_set'].split(',')
+        with self.lock:
+            self.fetched += len(resource_ids)
+            in_flight = self.fetched - sum(len(ids) for ids in self.processed.values())
+            self.max_in_flight = max(self.max_in_flight, in_flight)
+        return Mock(content=json.dumps([
+            {'uri': f'{uri}/{resource_id}'} for resource_id in resource_ids]).encode())
+
+    def task_resource(self, repo, resource, xml_dir, pdf_dir, fetched_at):
+        """Stand in for processing a resource."""
+        time.sleep(0.005)
+        with self.lock:
+            self.processed[self.arcflow.get_repo_id(repo)].append(resource['uri'])
+
+    def index_collections(self, repo_id, xml_dir):
+        """Stand in for indexing the EADs of a repository."""
+        with self.lock:
+            self.indexed.append((repo_id, len(self.processed[repo_id])))
+        return True
+
+    def run_process_collections(self):
+        """Run process_collections, failing instead of hanging if it stalls."""
+        errors = []
+        def target():
+            try:
+                self.arcflow.process_collections(2, 0)
+            except Exception as e:
+                errors.append(e)
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive(), 'process_collections stalled')
+        return errors
+
+    def test_indexes_each_repository_once_after_its_resources(self):
+        """Test that each repository is indexed once, after all its resources."""
+        errors = self.run_process_collections()
+
+        self.assertEqual(errors, [])
+        self.assertCountEqual(self.indexed, [
+            (repo_id, len(resource_ids)) for repo_id, resource_ids in self.resource_ids.items()])
+        self.assertEqual(self.arcflow.flush_solr_deletes.call_count, len(self.repos))
+        self.arcflow.flush_solr_deletes.assert_called_with(commit=False)
+        self.arcflow.commit_arclight_solr.assert_called_once()
+
+    def test_resources_in_flight_are_bounded(self):
+        """Test that batches are only fetched while few resources are pending."""
+        self.run_process_collections()
+
+        self.assertEqual(self.fetched, sum(len(ids) for ids in self.resource_ids.values()))
+        self.assertGreater(self.max_in_flight, 0)
+        self.assertLessEqual(self.max_in_flight, 2 * self.arcflow.resources_batch_size)
+
+    def test_failing_resource_does_not_stall(self):
+        """Test that a failing resource is reported after the others are indexed."""
+        task_resource = self.task_resource
+        def failing_task_resource(repo, resource, *args):
+            if resource['uri'] == '/repositories/2/resources/5':
+                raise RuntimeError('transform failed')
+            task_resource(repo, resource, *args)
+        self.arcflow.task_resource = failing_task_resource
+
+        errors = self.run_process_collections()
+
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], RuntimeError)
+        self.assertCountEqual(self.indexed, [('2', 10), ('3', 5)])
+        self.arcflow.commit_arclight_solr.assert_called_once()
+
+
+class TestPollPdfJobs(unittest.TestCase):
+    """Test cases for polling ArchivesSpace PDF jobs."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.arcflow = make_arcflow(job_type='print_to_pdf_job')
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.sleep = patch.object(main.time, 'sleep').start()
+        self.addCleanup(patch.stopall)
+        self.addCleanup(self.executor.shutdown)
+
+    def set_job_statuses(self, job_statuses):
+        """Make task_pdf return the given statuses of each job in turn."""
+        lock = threading.Lock()
+        remaining = {pdf_symlink: list(statuses) for pdf_symlink, statuses in job_statuses.items()}
+        def task_pdf(pdf_symlink):
+            with lock:
+                job_status = remaining[pdf_symlink].pop(0)
+            if isinstance(job_status, Exception):
+                raise job_status
+            return job_status
+        self.arcflow.task_pdf = Mock(side_effect=task_pdf)
+
+    def polled(self, pdf_symlink):
+        """Return how many times the job was checked."""
+        return [call.args[0] for call in self.arcflow.task_pdf.call_args_list].count(pdf_symlink)
+
+    def test_jobs_finish_across_rounds(self):
+        """Test that every job is polled until it finishes."""
+        self.set_job_statuses({
+            'a': ['queued', 'completed'],
+            'b': ['queued', 'running', 'running', 'failed'],
+        })
+
+        self.arcflow.poll_pdf_jobs(self.executor, ['a', 'b'])
+
+        self.assertEqual(self.polled('a'), 2)
+        self.assertEqual(self.polled('b'), 4)
+        self.assertEqual(self.sleep.call_count, 3)
+
+    def test_backoff_resets_on_status_change(self):
+        """Test that the delay backs off while no job changes status."""
+        self.set_job_statuses({
+            'a': ['queued', 'queued', 'queued', 'running', 'running', 'completed'],
+        })
+
+        self.arcflow.poll_pdf_jobs(self.executor, ['a'])
+
+        initial = self.arcflow.PDF_POLL_INITIAL_DELAY
+        self.assertEqual(
+            [call.args[0] for call in self.sleep.call_args_list],
+            [initial, initial * 1.5, initial * 1.5 * 1.5, initial, initial * 1.5])
+
+    def test_backoff_is_capped(self):
+        """Test that the delay does not exceed the maximum."""
+        self.set_job_statuses({'a': ['queued'] * 20 + ['completed']})
+
+        self.arcflow.poll_pdf_jobs(self.executor, ['a'])
+
+        self.assertEqual(self.sleep.call_args_list[-1].args[0], self.arcflow.PDF_POLL_MAX_DELAY)
+
+    def test_queued_jobs_until_sentinel(self):
+        """Test that queued jobs are polled and None stops the poller."""
+        self.set_job_statuses({'a': ['completed'], 'b': ['queued', 'completed']})
+        pdf_job_queue = queue.Queue()
+        poller = threading.Thread(
+            target=self.arcflow.poll_pdf_jobs, args=(self.executor, [], pdf_job_queue))
+        poller.start()
+
+        pdf_job_queue.put('a')
+        pdf_job_queue.put('b')
+        deadline = time.monotonic() + 5
+        while self.polled('b') < 2 and time.monotonic() < deadline:
+            threading.Event().wait(0.01)
+        # waits for more jobs while the queue is open
+        self.assertTrue(poller.is_alive())
+
+        pdf_job_queue.put(None)
+        poller.join(timeout=5)
+        self.assertFalse(poller.is_alive())
+        self.assertEqual(self.polled('a'), 1)
+        self.assertEqual(self.polled('b'), 2)
+
+    def test_failed_status_check_is_retried(self):
+        """Test that an error checking a job does not stop the poller."""
+        self.set_job_statuses({
+            'a': [ConnectionError('connection reset'), 'completed'],
+            'b': ['completed'],
+        })
+
+        self.arcflow.poll_pdf_jobs(self.executor, ['a', 'b'])
+
+        self.assertEqual(self.polled('a'), 2)
+        self.arcflow.log.error.assert_called_once()
+
+    def test_unsaved_pdf_is_retried(self):
+        """Test that a job whose PDF could not be saved is checked again."""
+        self.set_job_statuses({'a': ['running', None, 'completed']})
+
+        self.arcflow.poll_pdf_jobs(self.executor, ['a'])
+
+        self.assertEqual(self.polled('a'), 3)
+
+    def test_unfinished_job_times_out(self):
+        """Test that a job that never finishes is left for the next run."""
+        self.arcflow.PDF_JOB_TIMEOUT = 0
+        self.set_job_statuses({'a': ['running']})
+
+        self.arcflow.poll_pdf_jobs(self.executor, ['a'])
+
+        self.assertEqual(self.polled('a'), 1)
+        self.arcflow.log.warning.assert_called_once()
+
+
+class TestTaskPdf(unittest.TestCase):
+    """Test cases for saving the PDF of a finished job."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        # task_pdf splits the symlink path on underscores
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        while '_' in self.tmp_dir.name:
+            self.tmp_dir.cleanup()
+            self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.pdf_symlink = os.path.join(self.tmp_dir.name, 'created_2_5_ead.7.pdf')
+        os.symlink('ead.7.pdf', self.pdf_symlink)
+        self.arcflow = make_arcflow(job_type='print_to_pdf_job')
+        self.body = os.urandom(2 * 1024 * 1024 + 17)
+        self.raw = io.BytesIO(self.body)
+        self.arcflow.client = Mock()
+        self.arcflow.client.get.side_effect = self.get
+
+    def get(self, uri, **kwargs):
+        """Stand in for the ArchivesSpace job endpoints."""
+        if uri == '/repositories/2/jobs/5':
+            return json_response({'status': 'completed'})
+        if uri == '/repositories/2/jobs/5/output_files':
+            return json_response([9])
+        if uri == '/repositories/2/jobs/5/output_files/9':
+            return streamed_response(self.raw)
+        raise AssertionError(f'unexpected request {uri}')
+
+    def test_saves_streamed_pdf(self):
+        """Test that the whole PDF is saved and the job marked completed."""
+        self.assertEqual(self.arcflow.task_pdf(self.pdf_symlink), 'completed')
+
+        with open(os.path.join(self.tmp_dir.name, 'ead.7.pdf'), 'rb') as file:
+            self.assertEqual(file.read(), self.body)
+        self.assertTrue(os.path.islink(os.path.join(self.tmp_dir.name, 'completed_2_5_ead.7.pdf')))
+        self.assertFalse(os.path.lexists(self.pdf_symlink))
+
+    def test_interrupted_download_keeps_job_pending(self):
+        """Test that a PDF whose download fails is downloaded again later."""
+        self.raw = FailingStream(self.body)
+
+        self.assertIsNone(self.arcflow.task_pdf(self.pdf_symlink))
+
+        self.assertTrue(os.path.islink(self.pdf_symlink))
+        self.assertFalse(os.path.lexists(os.path.join(self.tmp_dir.name, 'completed_2_5_ead.7.pdf')))
+
+
+class TestSolrDeletes(unittest.TestCase):
+    """Test cases for queueing and flushing Solr deletions."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.xml_dir = os.path.join(self.tmp_dir.name, 'xml')
+        self.pdf_dir = os.path.join(self.tmp_dir.name, 'pdf')
+        os.makedirs(self.xml_dir)
+        os.makedirs(self.pdf_dir)
+        self.arcflow = make_arcflow()
+        self.post = self.arcflow.solr_session.post
+        self.post.return_value = Mock(status_code=200)
+
+    def create_ead(self, resource_id, ead_id):
+        """Create the XML, PDF and resource ID symlink files of an EAD."""
+        for file_path in (f'{self.xml_dir}/{ead_id}.xml', f'{self.pdf_dir}/{ead_id}.pdf'):
+            with open(file_path, 'w') as file:
+                file.write(ead_id)
+        os.symlink(f'{ead_id}.xml', f'{self.xml_dir}/{resource_id}.xml')
+
+    def delete_ead(self, resource_id, ead_id):
+        """Queue the EAD created by create_ead to be deleted."""
+        self.arcflow.delete_ead(
+            resource_id, ead_id, f'{self.xml_dir}/{ead_id}.xml', f'{self.pdf_dir}/{ead_id}.pdf')
+
+    def posted_deletes(self, call):
+        """Return the IDs deleted by a Solr update request."""
+        return json.loads(call.kwargs['data'])['delete']
+
+    def test_flush_deletes_records_in_one_request(self):
+        """Test that queued records are deleted in a single request."""
+        self.create_ead(1, 'ead-1')
+        self.create_ead(2, 'ead-2')
+        self.delete_ead(1, 'ead-1')
+        self.delete_ead(2, 'ead-2')
+
+        self.assertEqual(self.arcflow.flush_solr_deletes(), 2)
+
+        self.post.assert_called_once()
+        call = self.post.call_args
+        self.assertEqual(call.args[0], f'{self.arcflow.solr_url}/update?commit=true')
+        self.assertEqual(call.kwargs['headers'], {'Content-Type': 'application/json'})
+        self.assertEqual(self.posted_deletes(call), ['ead-1', 'ead-2'])
+        self.assertEqual(os.listdir(self.xml_dir), [])
+        self.assertEqual(os.listdir(self.pdf_dir), [])
+        self.assertEqual(self.arcflow.pending_solr_deletes, [])
+
+    def test_symlink_to_new_ead_is_kept(self):
+        """Test that a resource ID symlink now pointing to a new EAD is kept."""
+        self.create_ead(1, 'ead-old')
+        self.delete_ead(1, 'ead-old')
+        os.remove(f'{self.xml_dir}/1.xml')
+        with open(f'{self.xml_dir}/ead-new.xml', 'w') as file:
+            file.write('ead-new')
+        os.symlink('ead-new.xml', f'{self.xml_dir}/1.xml')
+
+        self.arcflow.flush_solr_deletes()
+
+        self.assertCountEqual(os.listdir(self.xml_dir), ['1.xml', 'ead-new.xml'])
+
+    def test_flush_without_commit(self):
+        """Test that a flush before indexing leaves the commit for later."""
+        self.arcflow.queue_solr_delete('ead-1', (f'{self.xml_dir}/ead-1.xml',))
+
+        self.assertEqual(self.arcflow.flush_solr_deletes(commit=False), 1)
+
+        self.assertEqual(self.post.call_args.args[0], f'{self.arcflow.solr_url}/update?commit=false')
+
+        # the final flush commits the deletions queued since
+        self.arcflow.queue_solr_delete('ead-2', (f'{self.xml_dir}/ead-2.xml',))
+        self.assertEqual(self.arcflow.flush_solr_deletes(), 1)
+        call = self.post.call_args
+        self.assertEqual(call.args[0], f'{self.arcflow.solr_url}/update?commit=true')
+        self.assertEqual(self.posted_deletes(call), ['ead-2'])
+
+    def test_flush_nothing_queued(self):
+        """Test that no request is sent when nothing is queued."""
+        self.assertEqual(self.arcflow.flush_solr_deletes(), 0)
+        self.post.assert_not_called()
+
+    def test_failed_delete_keeps_files(self):
+        """Test that files are kept if the records are not deleted from Solr."""
+        self.create_ead(1, 'ead-1')
+        self.delete_ead(1, 'ead-1')
+        self.post.return_value = Mock(status_code=500)
+
+        self.assertEqual(self.arcflow.flush_solr_deletes(), 0)
+
+        self.assertCountEqual(os.listdir(self.xml_dir), ['1.xml', 'ead-1.xml'])
+        self.assertEqual(os.listdir(self.pdf_dir), ['ead-1.pdf'])
+
+    def test_concurrent_queueing(self):
+        """Test that records queued from several threads are all deleted once."""
+        def queue_deletes(thread_num):
+            for i in range(200):
+                self.arcflow.delete_ead(
+                    i, f'ead-{thread_num}-{i}',
+                    f'{self.xml_dir}/ead-{thread_num}-{i}.xml',
+                    f'{self.pdf_dir}/ead-{thread_num}-{i}.pdf')
+        threads = [threading.Thread(target=queue_deletes, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.arcflow.flush_solr_deletes(), 8 * 200)
+
+        self.assertCountEqual(
+            self.posted_deletes(self.post.call_args),
+            [f'ead-{n}-{i}' for n in range(8) for i in range(200)])
+
+
+class TestIndexCollections(unittest.TestCase):
+    """Test cases for indexing collection EADs with traject."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.xml_dir = os.path.join(self.tmp_dir.name, 'xml')
+        os.makedirs(self.xml_dir)
+        self.arcflow = make_arcflow(
+            arclight_dir=self.tmp_dir.name,
+            batch_size=2,
+            ead_extra_config=None)
+        self.arcflow.get_gem_path = Mock(return_value='/gems/arclight')
+        for repo_id, resource_id in (('2', 1), ('2', 2), ('2', 3), ('3', 4)):
+            with open(f'{self.xml_dir}/ead-{resource_id}.xml', 'w') as file:
+                file.write('<ead/>')
+            os.symlink(f'ead-{resource_id}.xml', f'{self.xml_dir}/created_{repo_id}_{resource_id}.xml')
+        # the directory index is scanned before indexing
+        with self.arcflow.dir_entries_lock:
+            self.arcflow.get_dir_entries(self.xml_dir)
+        self.run = patch.object(main.subprocess, 'run', return_value=Mock(returncode=0)).start()
+        self.addCleanup(patch.stopall)
+
+    def scanned_entries(self):
+        """Return the entries of the directory as scanned now."""
+        with os.scandir(self.xml_dir) as dir_iterator:
+            return {
+                entry.name: os.readlink(entry.path) if entry.is_symlink() else None
+                for entry in dir_iterator}
+
+    def test_indexed_files_are_completed(self):
+        """Test that indexed files are renamed and the directory index follows."""
+        self.assertTrue(self.arcflow.index_collections('2', self.xml_dir))
+
+        self.assertEqual(self.run.call_count, 2)
+        indexed = [
+            os.path.basename(arg) for call in self.run.call_args_list
+            for arg in call.args[0] if arg.startswith(self.xml_dir)]
+        self.assertCountEqual(indexed, ['created_2_1.xml', 'created_2_2.xml', 'created_2_3.xml'])
+        self.assertEqual(self.run.call_args.kwargs['env']['REPOSITORY_ID'], '2')
+
+        entries = self.scanned_entries()
+        self.assertEqual(self.arcflow.dir_entries[self.xml_dir], entries)
+        self.assertEqual(sorted(name for name in entries if name.startswith('completed_')),
+                         ['completed_2_1.xml', 'completed_2_2.xml', 'completed_2_3.xml'])
+        self.assertEqual(entries['completed_2_1.xml'], 'ead-1.xml')
+        self.assertIn('created_3_4.xml', entries)
+
+    def test_failed_batch_is_kept_pending(self):
+        """Test that files of a failed batch are left to index again."""
+        self.run.return_value = Mock(returncode=1, stderr=b'error')
+
+        self.assertFalse(self.arcflow.index_collections('2', self.xml_dir))
+
+        entries = self.scanned_entries()
+        self.assertEqual(self.arcflow.dir_entries[self.xml_dir], entries)
+        self.assertFalse(any(name.startswith('completed_') for name in entries))
+
+
+class TestConfigFile(unittest.TestCase):
+    """Test cases for the last updated timestamps config file."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.arcflow = make_arcflow(
+            arcflow_file_path=os.path.join(self.tmp_dir.name, '.arcflow.json'),
+            arcflow_yaml_file_path=os.path.join(self.tmp_dir.name, '.arcflow.yml'),
+            skip_timestamp_update=False)
+
+    def test_parse_config_timestamp(self):
+        """Test that every stored format is parsed to an aware datetime."""
+        expected = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        for value in (
+                int(expected.timestamp()),
+                '2024-01-02T03:04:05+0000',
+                '2024-01-02T03:04:05+00:00',
+                '2024-01-02T03:04:05',
+                datetime(2024, 1, 2, 3, 4, 5),
+                expected):
+            with self.subTest(value=value):
+                self.assertEqual(self.arcflow.parse_config_timestamp(value), expected)
+        self.assertEqual(
+            self.arcflow.parse_config_timestamp(None), datetime.fromtimestamp(0, timezone.utc))
+
+    def test_migrate_legacy_yaml(self):
+        """Test that the legacy .arcflow.yml timestamps are saved to .arcflow.json."""
+        with open(self.arcflow.arcflow_yaml_file_path, 'w') as file:
+            file.write(
+                'last_updated_collections: 1704164645\n'
+                "last_updated_creators: '2024-01-02T03:04:05+0000'\n"
+                'last_updated_digital_objects: 2024-01-02T03:04:05\n')
+        config = self.arcflow.load_config_file()
+        timestamps = [self.arcflow.parse_config_timestamp(value) for value in config.values()]
+        self.assertEqual(min(timestamps), datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+
+        self.arcflow.last_updated_collections = datetime(2024, 2, 1, tzinfo=timezone.utc)
+        self.arcflow.save_config_file('collections')
+
+        with open(self.arcflow.arcflow_file_path) as file:
+            self.assertEqual(json.load(file), {
+                'last_updated_collections': int(self.arcflow.last_updated_collections.timestamp()),
+                'last_updated_creators': 1704164645,
+                'last_updated_digital_objects': 1704164645,
+            })
+        self.arcflow.log.error.assert_not_called()
+
+
+class TestTaskResource(unittest.TestCase):
+    """Test cases for saving the EAD of a resource."""
+
+    EAD = b'<ead><eadheader><eadid>ead.7</eadid></eadheader></ead>'
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.xml_dir = os.path.join(self.tmp_dir.name, 'xml')
+        self.pdf_dir = os.path.join(self.tmp_dir.name, 'pdf')
+        os.makedirs(self.xml_dir)
+        os.makedirs(self.pdf_dir)
+        self.arcflow = make_arcflow(
+            force_update=False,
+            skip_pdf_generation=True,
+            dry_run_aspace=False)
+        self.arcflow.client = Mock()
+        self.arcflow.client.get.return_value = Mock(status_code=200, content=self.EAD)
+        self.arcflow.get_creator_bioghist = Mock(return_value=None)
+        self.arcflow.xml_transform = Mock()
+        self.arcflow.xml_transform.transform_collection_ead.side_effect = (
+            lambda ead, resource, **kwargs: ead)
+        self.repo = {'uri': '/repositories/2'}
+        self.resource = {
+            'uri': '/repositories/2/resources/7',
+            'ead_id': 'ead.7',
+            'publish': True,
+            'suppressed': False,
+            'system_mtime': '2024-01-02T03:04:05Z',
+        }
+        # saved before the resource was last modified
+        self.saved_at = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+        self.fetched_at = int(datetime(2024, 1, 3, tzinfo=timezone.utc).timestamp())
+        self.xml_file_path = f'{self.xml_dir}/ead.7.xml'
+
+    def save_ead(self, content):
+        """Save an EAD from a previous run."""
+        with open(self.xml_file_path, 'wb') as file:
+            file.write(content)
+        os.utime(self.xml_file_path, (self.saved_at, self.saved_at))
+        os.symlink('ead.7.xml', f'{self.xml_dir}/7.xml')
+
+    def task_resource(self):
+        """Process the resource."""
+        self.arcflow.task_resource(
+            self.repo, self.resource, self.xml_dir, self.pdf_dir, self.fetched_at)
+
+    def read_ead(self):
+        """Return the saved EAD."""
+        with open(self.xml_file_path, 'rb') as file:
+            return file.read()
+
+    def test_unchanged_ead_is_skipped(self):
+        """Test that a byte-identical EAD is not saved or reindexed."""
+        self.save_ead(self.EAD)
+
+        self.task_resource()
+
+        self.assertEqual(self.read_ead(), self.EAD)
+        self.assertFalse(os.path.lexists(f'{self.xml_dir}/created_2_7.xml'))
+        # dated by the fetch so it is skipped until modified again
+        self.assertEqual(os.path.getmtime(self.xml_file_path), self.fetched_at)
+
+    def test_changed_ead_is_saved_and_reindexed(self):
+        """Test that a changed EAD is saved and queued for indexing."""
+        self.save_ead(b'<ead/>')
+
+        self.task_resource()
+
+        self.assertEqual(self.read_ead(), self.EAD)
+        self.assertEqual(os.readlink(f'{self.xml_dir}/created_2_7.xml'), 'ead.7.xml')
+        self.assertEqual(os.readlink(f'{self.xml_dir}/7.xml'), 'ead.7.xml')
+        self.assertEqual(os.path.getmtime(self.xml_file_path), self.fetched_at)
+
+    def test_forced_unchanged_ead_is_reindexed(self):
+        """Test that unchanged EADs are saved and reindexed on forced runs."""
+        self.save_ead(self.EAD)
+        self.arcflow.force_update = True
+
+        self.task_resource()
+
+        self.assertEqual(os.readlink(f'{self.xml_dir}/created_2_7.xml'), 'ead.7.xml')
+
+    def test_not_modified_ead_is_skipped(self):
+        """Test that an EAD reported as not modified is kept."""
+        self.save_ead(b'<ead/>')
+        self.arcflow.client.get.return_value = Mock(status_code=304, content=b'')
+
+        self.task_resource()
+
+        self.assertEqual(
+            self.arcflow.client.get.call_args.kwargs['headers'],
+            {'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+        self.assertEqual(self.read_ead(), b'<ead/>')
+        self.assertFalse(os.path.lexists(f'{self.xml_dir}/created_2_7.xml'))
+
+    def test_no_conditional_request_on_forced_runs(self):
+        """Test that forced runs fetch and transform every EAD."""
+        self.save_ead(b'<ead/>')
+        self.arcflow.force_update = True
+
+        self.task_resource()
+
+        self.assertEqual(self.arcflow.client.get.call_args.kwargs['headers'], {})
+        self.assertEqual(self.read_ead(), self.EAD)
+
+    def test_no_conditional_request_without_saved_ead(self):
+        """Test that EADs missing on disk are fetched unconditionally."""
+        self.save_ead(b'<ead/>')
+        # the directory index still lists the removed EAD
+        self.arcflow.get_ead_from_symlink(f'{self.xml_dir}/7.xml')
+        os.remove(self.xml_file_path)
+
+        self.task_resource()
+
+        self.assertEqual(self.arcflow.client.get.call_args.kwargs['headers'], {})
+        self.assertEqual(self.read_ead(), self.EAD)
+        self.assertEqual(os.readlink(f'{self.xml_dir}/created_2_7.xml'), 'ead.7.xml')
+
+    def test_up_to_date_resource_is_not_fetched(self):
+        """Test that a resource unmodified since its EAD was saved is skipped."""
+        self.saved_at = self.fetched_at
+        self.save_ead(self.EAD)
+
+        self.task_resource()
+
+        self.arcflow.client.get.assert_not_called()
+        self.assertFalse(os.path.lexists(f'{self.xml_dir}/created_2_7.xml'))
+
+
+class TestLoadYamlFile(unittest.TestCase):
+    """Test cases for loading YAML files."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.file_path = os.path.join(self.tmp_dir.name, 'file.yml')
+
+    def write(self, content, mtime_ns):
+        """Write the file with the given modification time."""
+        with open(self.file_path, 'w') as file:
+            file.write(content)
+        os.utime(self.file_path, ns=(mtime_ns, mtime_ns))
+
+    def test_rewritten_file_is_reloaded(self):
+        """Test that a rewritten file is parsed again."""
+        self.write('key: old\n', 1_000_000_000)
+        self.assertEqual(load_yaml_file(self.file_path), {'key': 'old'})
+
+        self.write('key: new\n', 2_000_000_000)
+        self.assertEqual(load_yaml_file(self.file_path), {'key': 'new'})
+
+    def test_returns_copy(self):
+        """Test that changes to the returned content are not cached."""
+        self.write('key: [1]\n', 1_000_000_000)
+
+        load_yaml_file(self.file_path)['key'].append(2)
+
+        self.assertEqual(load_yaml_file(self.file_path), {'key': [1]})
+
+    def test_concurrent_loads(self):
+        """Test that files loaded from several threads are all parsed correctly."""
+        file_paths = []
+        for i in range(2 * main.yaml_cache_max_size):
+            file_path = os.path.join(self.tmp_dir.name, f'{i}.yml')
+            with open(file_path, 'w') as file:
+                file.write(f'key: {i}\n')
+            file_paths.append(file_path)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(load_yaml_file, file_paths * 20))
+
+        self.assertEqual(results, [{'key': i} for i in range(len(file_paths))] * 20)
+        self.assertLessEqual(len(main.yaml_cache), main.yaml_cache_max_size)
+
+
+
+class TestAtomicWrite(unittest.TestCase):
+    """Test cases for writing files atomically."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.file_path = os.path.join(self.tmp_dir.name, 'file.yml')
+        with open(self.file_path, 'w') as file:
+            file.write('original')
+
+    def read(self):
+        """Return the content of the file."""
+        with open(self.file_path) as file:
+            return file.read()
+
+    def test_replaces_file(self):
+        """Test that the file is replaced once the block completes."""
+        with atomic_write(self.file_path, 'w') as file:
+            file.write('updated')
+            self.assertEqual(self.read(), 'original')
+
+        self.assertEqual(self.read(), 'updated')
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['file.yml'])
+        self.assertEqual(os.stat(self.file_path).st_mode & 0o777, 0o644)
+
+    def test_failed_write_removes_temporary_file(self):
+        """Test that a failed write keeps the file and leaves nothing behind."""
+        with self.assertRaises(ValueError):
+            with atomic_write(self.file_path, 'w') as file:
+                file.write('partial')
+                raise ValueError('serialization failed')
+
+        self.assertEqual(self.read(), 'original')
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['file.yml'])
+
+
+class TestSaveFile(unittest.TestCase):
+    """Test cases for saving EAD and PDF files."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.file_path = os.path.join(self.tmp_dir.name, 'ead.pdf')
+        self.arcflow = make_arcflow()
+
+    def read(self):
+        """Return the content of the file."""
+        with open(self.file_path, 'rb') as file:
+            return file.read()
+
+    def test_saves_bytes(self):
+        """Test that bytes are saved and recorded in the directory index."""
+        self.arcflow.get_dir_entries(self.tmp_dir.name)
+
+        self.assertTrue(self.arcflow.save_file(self.file_path, b'%PDF', 'PDF'))
+
+        self.assertEqual(self.read(), b'%PDF')
+        self.assertIn('ead.pdf', self.arcflow.dir_entries[self.tmp_dir.name])
+
+    def test_saves_streamed_response(self):
+        """Test that the whole body of a streamed response is saved."""
+        body = os.urandom(3 * 1024 * 1024 + 17)
+
+        self.assertTrue(self.arcflow.save_file(
+            self.file_path, streamed_response(io.BytesIO(body)), 'PDF'))
+
+        self.assertEqual(self.read(), body)
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['ead.pdf'])
+
+    def test_failed_write_keeps_original(self):
+        """Test that a failed write keeps the previous file and no temporary file."""
+        with open(self.file_path, 'wb') as file:
+            file.write(b'original')
+
+        self.assertFalse(self.arcflow.save_file(
+            self.file_path, streamed_response(FailingStream(os.urandom(2 * 1024 * 1024))), 'PDF'))
+
+        self.assertEqual(self.read(), b'original')
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['ead.pdf'])
+        self.arcflow.log.critical.assert_called_once()
+
+
+class TestCreateSymlink(unittest.TestCase):
+    """Test cases for creating symlinks."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.symlink_path = os.path.join(self.tmp_dir.name, '7.xml')
+        self.arcflow = make_arcflow()
+        with self.arcflow.dir_entries_lock:
+            self.arcflow.get_dir_entries(self.tmp_dir.name)
+
+    def test_replaces_symlink(self):
+        """Test that an existing symlink is replaced and indexed."""
+        os.symlink('ead-old.xml', self.symlink_path)
+
+        self.assertTrue(self.arcflow.create_symlink('ead-new.xml', self.symlink_path))
+
+        self.assertEqual(os.readlink(self.symlink_path), 'ead-new.xml')
+        self.assertEqual(self.arcflow.dir_entries[self.tmp_dir.name], {'7.xml': 'ead-new.xml'})
+
+    def test_known_symlink_is_kept(self):
+        """Test that a symlink already pointing to the target is not recreated."""
+        self.arcflow.create_symlink('ead.xml', self.symlink_path)
+
+        self.assertFalse(self.arcflow.create_symlink('ead.xml', self.symlink_path))
+
+    def test_stale_temporary_symlink_is_replaced(self):
+        """Test that a temporary symlink left by an interrupted run is replaced."""
+        stale_path = os.path.join(self.tmp_dir.name, f'.7.xml.{threading.get_ident()}.tmp')
+        os.symlink('ead-stale.xml', stale_path)
+
+        self.assertTrue(self.arcflow.create_symlink('ead.xml', self.symlink_path))
+
+        self.assertEqual(os.readlink(self.symlink_path), 'ead.xml')
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['7.xml'])
+
+
+class TestUpdateRepositories(unittest.TestCase):
+    """Test cases for updating repositories.yml."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.config_dir = os.path.join(self.tmp_dir.name, 'config')
+        os.makedirs(self.config_dir)
+        self.repos_file_path = os.path.join(self.config_dir, 'repositories.yml')
+        with open(self.repos_file_path, 'w') as file:
+            file.write("'2':\n  name: Old Name\n")
+        self.arcflow = make_arcflow(
+            arclight_dir=self.tmp_dir.name,
+            force_update=True,
+            max_processes=2,
+            last_updated_global=datetime.fromtimestamp(0, timezone.utc))
+        self.arcflow.get_repositories = Mock(return_value=[{
+            'uri': '/repositories/2',
+            'repo_code': 'UA',
+            'name': 'University Archives',
+            'publish': True,
+            'system_mtime': '2024-01-02T03:04:05Z',
+            'user_mtime': '2024-01-02T03:04:05Z',
+            'agent_representation': {'ref': '/agents/corporate_entities/1'},
+        }])
+        self.arcflow.client = Mock()
+        self.arcflow.client.get.return_value = json_response({
+            'agent_contacts': [{'telephones': [], 'email': 'archives@example.edu'}],
+        })
+
+    def test_writes_repositories(self):
+        """Test that repositories.yml is replaced with the fetched repositories."""
+        self.arcflow.update_repositories()
+
+        repositories = load_yaml_file(self.repos_file_path)
+        self.assertEqual(repositories['2']['name'], 'University Archives')
+        self.assertIn('archives@example.edu', repositories['2']['contact_html'])
+        self.assertEqual(os.listdir(self.config_dir), ['repositories.yml'])
+
+    def test_failed_write_keeps_repositories(self):
+        """Test that a failed dump keeps repositories.yml and no temporary file."""
+        with patch.object(main.yaml, 'dump', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.arcflow.update_repositories()
+
+        with open(self.repos_file_path) as file:
+            self.assertEqual(file.read(), "'2':\n  name: Old Name\n")
+        self.assertEqual(os.listdir(self.config_dir), ['repositories.yml'])
+
+
+if __name__ == '__main__':
+    unittest.main()
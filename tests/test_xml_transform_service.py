@@ -132,6 +132,69 @@ class TestXmlTransformService(unittest.TestCase):
         self.assertIn('xmlns', result)
         self.assertIn('urn:isbn:1-931666-22-9', result)
 
+    def test_inject_collection_metadata_bytes(self):
+        """Test that EAD passed as bytes is transformed and returned as bytes."""
+        xml_content = REAL_EAD_WITH_NAMESPACE.encode('utf-8')
+
+        result = self.service.inject_collection_metadata(
+            xml_content,
+            record_group='RG 1 — Test Group',
+            subgroup=None,
+            bioghist_content=None
+        )
+
+        self.assertIsInstance(result, bytes)
+        self.assertIn('RG 1 — Test Group'.encode('utf-8'), result)
+        self.assertTrue(result.startswith(b'<?xml'))
+
+    def test_inject_collection_metadata_nothing_to_inject(self):
+        """Test that EAD is returned untouched when there is no metadata."""
+        xml_content = REAL_EAD_WITH_NAMESPACE.encode('utf-8')
+
+        result = self.service.inject_collection_metadata(
+            xml_content,
+            record_group=None,
+            subgroup=None,
+            bioghist_content=None
+        )
+
+        self.assertIs(result, xml_content)
+
+    def test_transform_collection_ead(self):
+        """Test that the combined transform matches applying both transforms."""
+        resource = {
+            'linked_agents': [
+                {'role': 'creator', 'ref': '/agents/corporate_entities/123'}
+            ]
+        }
+        xml_content = REAL_EAD_WITH_NAMESPACE.encode('utf-8')
+        metadata = {
+            'record_group': 'RG 1 — Test Group',
+            'subgroup': 'SG 1.1 — Test Subgroup',
+            'bioghist_content': '<bioghist><p>Test bioghist</p></bioghist>',
+        }
+
+        result = self.service.transform_collection_ead(xml_content, resource, **metadata)
+
+        expected = self.service.inject_collection_metadata(
+            self.service.add_creator_ids_to_ead(xml_content, resource), **metadata)
+        self.assertEqual(result, expected)
+        self.assertIn(b'arcuit:creator_id="creator_corporate_entities_123"', result)
+
+    def test_transform_collection_ead_nothing_to_transform(self):
+        """Test that EAD is returned untouched when there is nothing to add."""
+        xml_content = REAL_EAD_WITH_NAMESPACE.encode('utf-8')
+
+        result = self.service.transform_collection_ead(
+            xml_content,
+            {'linked_agents': []},
+            record_group=None,
+            subgroup=None,
+            bioghist_content=None
+        )
+
+        self.assertIs(result, xml_content)
+
     def test_inject_collection_metadata_into_existing_bioghist(self):
         """Test that bioghist content is inserted into existing bioghist element."""
         xml_content = '''<ead>